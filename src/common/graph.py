@@ -0,0 +1,163 @@
+"""
+Graph representation shared by the driver and the MIP checker.
+
+Nodes are numbered 0..num_nodes-1 (the "var ids" used in the SAS encoding);
+col and dat files number them starting at 1.
+"""
+
+from array import array
+from bisect import bisect_left
+
+COL_FILE_BUFFER_SIZE = 1024 * 1024
+
+
+def to_var_id(node):
+    return int(node) - 1
+
+def to_node_id(var_id):
+    return str(int(var_id) + 1)
+
+
+class Graph(object):
+    """
+    Undirected graph in compressed sparse row format: the neighbours of
+    node v are neighbours[offsets[v]:offsets[v+1]] in increasing order.
+
+    Iterating over the graph yields all nodes (including isolated ones) and
+    graph[v] gives the neighbours of v, so the graph can be used like the
+    dictionaries of neighbour sets we used before.
+    """
+    def __init__(self, num_nodes, offsets, neighbours):
+        assert len(offsets) == num_nodes + 1
+        self.num_nodes = num_nodes
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self._neighbour_masks = None
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets):
+        """
+        Build the graph from two arrays holding the end points of all edges.
+        Duplicate edges are merged.
+        """
+        degree = array("q", [0]) * num_nodes
+        for v in sources:
+            degree[v] += 1
+        for v in targets:
+            degree[v] += 1
+        offsets = array("q", [0]) * (num_nodes + 1)
+        for v in range(num_nodes):
+            offsets[v + 1] = offsets[v] + degree[v]
+        del degree
+
+        position = array("q", offsets[:-1])
+        neighbours = array("i", [0]) * offsets[-1]
+        for u, v in zip(sources, targets):
+            neighbours[position[u]] = v
+            position[u] += 1
+            neighbours[position[v]] = u
+            position[v] += 1
+        del position
+
+        # Sort the neighbours of each node and drop duplicates in place.
+        write = 0
+        begin = 0
+        for v in range(num_nodes):
+            end = offsets[v + 1]
+            node_neighbours = sorted(set(neighbours[begin:end]))
+            offsets[v] = write
+            neighbours[write:write + len(node_neighbours)] = array("i", node_neighbours)
+            write += len(node_neighbours)
+            begin = end
+        offsets[num_nodes] = write
+        del neighbours[write:]
+        return cls(num_nodes, offsets, neighbours)
+
+    def __len__(self):
+        return self.num_nodes
+
+    def __iter__(self):
+        return iter(range(self.num_nodes))
+
+    def __getitem__(self, v):
+        return self.neighbours[self.offsets[v]:self.offsets[v + 1]]
+
+    @property
+    def num_edges(self):
+        return len(self.neighbours) // 2
+
+    def degree(self, v):
+        return self.offsets[v + 1] - self.offsets[v]
+
+    def edges(self):
+        """
+        Yield every edge (u, v) once, with u < v.
+        """
+        neighbours = self.neighbours
+        offsets = self.offsets
+        for u in range(self.num_nodes):
+            for i in range(offsets[u], offsets[u + 1]):
+                v = neighbours[i]
+                if u < v:
+                    yield u, v
+
+    def are_adjacent(self, u, v):
+        begin, end = self.offsets[u], self.offsets[u + 1]
+        i = bisect_left(self.neighbours, v, begin, end)
+        return i < end and self.neighbours[i] == v
+
+    def neighbour_masks(self):
+        """
+        Return a list with the neighbourhood of every node as a bitmask, so
+        adjacency tests and neighbourhood operations on node sets become
+        single integer operations. The masks take num_nodes**2 / 8 bytes in
+        the worst case and are computed on first use, so only use them on
+        small and medium graphs.
+        """
+        if self._neighbour_masks is None:
+            masks = []
+            for v in range(self.num_nodes):
+                mask = 0
+                for u in self[v]:
+                    mask |= 1 << u
+                masks.append(mask)
+            self._neighbour_masks = masks
+        return self._neighbour_masks
+
+    def is_independent(self, nodes):
+        nodes = set(nodes)
+        return not any(u in nodes for v in nodes for u in self[v])
+
+
+def parse_col_file(filename):
+    num_nodes, num_edges = None, None
+    sources, targets = array("i"), array("i")
+    with open(filename, "rb", buffering=COL_FILE_BUFFER_SIZE) as f:
+        for line in f:
+            if line.startswith(b"e"):
+                _, v0, v1 = line.split()
+                sources.append(int(v0) - 1)
+                targets.append(int(v1) - 1)
+            elif line.startswith(b"p"):
+                args = line.split()
+                assert len(args) == 3
+                num_nodes, num_edges = int(args[1]), int(args[2])
+            else:
+                assert not line.strip() or line.startswith(b"c")
+    assert num_edges == len(sources)
+    if sources:
+        assert 0 <= min(sources) and max(sources) < num_nodes
+        assert 0 <= min(targets) and max(targets) < num_nodes
+    return Graph.from_edges(num_nodes, sources, targets)
+
+
+def parse_dat_file(filename):
+    start, target = None, None
+    with open(filename) as f:
+        for line in f:
+            args = line.split()
+            if args[0] == "s":
+                start = set([to_var_id(x) for x in args[1:]])
+            if args[0] == "t":
+                target = set([to_var_id(x) for x in args[1:]])
+    return start, target
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+"""
+Solve many instances with one or more configs and write one JSON line per
+run. Instances are given as directories (every X.col with its X_*.dat
+files) or as JSONL manifests with "col" and "dat" fields (relative paths
+are resolved from the manifest's directory).
+
+Runs are executed in parallel in forked copies of this process, so the
+driver is only started and imported once. The CPUs are divided between the
+parallel slots, and no more runs are started than fit into the memory
+budget. Every finished run is appended to the output file immediately, and
+runs that are already in the output file are skipped, so an interrupted
+batch can simply be started again.
+
+Usage: batch.py --configs C1 [C2 ...] --time-limit T --output RESULTS INSTANCES...
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import psutil
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+from cache import TaskCache, DEFAULT_CACHE_SIZE
+from configs import CONFIGS, TIME_BUFFER_FOR_RESPONSE, get_component_names
+from run import absolute_path, run_config
+
+GB = 1024 * 1024 * 1024
+
+
+def find_instances(path):
+    """
+    Return the (col, dat) pairs of a directory or manifest as absolute paths.
+    """
+    path = Path(path).resolve()
+    if path.is_dir():
+        instances = []
+        for col in sorted(path.glob("*.col")):
+            dats = sorted(path.glob(f"{col.stem}_*.dat")) + sorted(path.glob(f"{col.stem}.dat"))
+            instances.extend((str(col), str(dat)) for dat in dats)
+        return instances
+    instances = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                instances.append((str((path.parent / entry["col"]).resolve()),
+                                  str((path.parent / entry["dat"]).resolve())))
+    return instances
+
+
+def read_finished_runs(output):
+    finished = set()
+    if not os.path.exists(output):
+        return finished
+    with open(output) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # Incomplete last line of a crashed batch.
+                continue
+            finished.add((result["col"], result["dat"], result["config"]))
+    return finished
+
+
+def parse_answer(answer_filename):
+    """
+    Return the status of an answer (YES, NO or UNKNOWN) and the number of
+    jumps for YES answers.
+    """
+    status = "UNKNOWN"
+    num_states = 0
+    try:
+        with open(answer_filename) as f:
+            for line in f:
+                if line.startswith("a YES"):
+                    status = "YES"
+                elif line.startswith("a NO"):
+                    status = "NO"
+                elif line.startswith("a "):
+                    num_states += 1
+    except FileNotFoundError:
+        pass
+    length = num_states - 1 if status == "YES" else None
+    return status, length
+
+
+def run_job(job, cpus, job_dir, memory_limit, time_limit, cache):
+    """
+    Run one job in the forked child process. Never returns.
+    """
+    col, dat, config_name = job
+    exit_code = 1
+    try:
+        # Own process group, so the batch can kill the run including its components.
+        os.setpgid(0, 0)
+        os.sched_setaffinity(0, cpus)
+        os.chdir(job_dir)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        with open("answer.txt", "w") as out, open("driver.err", "w") as err:
+            os.dup2(out.fileno(), sys.stdout.fileno())
+            os.dup2(err.fileno(), sys.stderr.fileno())
+        deadline = time.monotonic() + time_limit - TIME_BUFFER_FOR_RESPONSE
+        run_config(CONFIGS[config_name], memory_limit, time_limit, col, dat, deadline, cache,
+                   stats_filename=str(job_dir / "stats.json"))
+        exit_code = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+class Batch(object):
+    def __init__(self, jobs, output, num_slots, cpus, memory_limit, time_limit, work_dir,
+                 cache=None, keep_run_dirs=False):
+        self.pending = list(jobs)
+        self.output = output
+        self.memory_limit = memory_limit
+        self.time_limit = time_limit
+        self.work_dir = Path(work_dir)
+        self.cache = cache
+        self.keep_run_dirs = keep_run_dirs
+        # Every slot gets its own CPUs, so the portfolios of parallel runs
+        # do not pin their components to the same CPUs.
+        self.free_slots = [cpus[i::num_slots] for i in range(num_slots)]
+        self.running = {}
+
+    def start(self, job):
+        cpus = self.free_slots.pop()
+        job_dir = Path(tempfile.mkdtemp(prefix="job_", dir=self.work_dir))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            run_job(job, cpus, job_dir, self.memory_limit, self.time_limit, self.cache)
+        self.running[pid] = (job, cpus, job_dir, time.monotonic())
+
+    def finish(self, pid, status, out):
+        job, cpus, job_dir, started = self.running.pop(pid)
+        self.free_slots.append(cpus)
+        col, dat, config_name = job
+        config = CONFIGS[config_name]
+        answer, length = parse_answer(job_dir / "answer.txt")
+        # The peak memory of every component, sampled by the run itself (see
+        # run.py --stats). Missing if the run crashed before writing them.
+        try:
+            components = json.loads((job_dir / "stats.json").read_text())["components"]
+        except (OSError, ValueError, KeyError):
+            components = []
+        result = {
+            "col": col,
+            "dat": dat,
+            "config": config_name,
+            "track": config.track,
+            "portfolio": get_component_names(config),
+            "status": answer,
+            "solved": answer != "UNKNOWN",
+            "length": length,
+            "time": round(time.monotonic() - started, 3),
+            "peak_rss_kb": max((c["peak_rss_kb"] for c in components), default=None),
+            "components": [{"component": c["component"], "peak_rss_kb": c["peak_rss_kb"]}
+                           for c in components],
+            "exit_code": -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status),
+            "time_limit": self.time_limit,
+            "memory_limit": self.memory_limit,
+        }
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+        if not self.keep_run_dirs:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        print(f"{answer:7} {result['time']:8.2f}s  {config_name}  {Path(dat).name}", flush=True)
+
+    def run(self):
+        with open(self.output, "a") as out:
+            if out.tell() > 0:
+                # Terminate an incomplete last line of a crashed batch.
+                with open(self.output, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read() != b"\n":
+                        out.write("\n")
+            try:
+                while self.pending or self.running:
+                    while self.pending and self.free_slots:
+                        self.start(self.pending.pop(0))
+                    pid, status = os.wait()
+                    if pid in self.running:
+                        self.finish(pid, status, out)
+            except KeyboardInterrupt:
+                self.kill_all()
+                raise
+
+    def kill_all(self):
+        for pid in self.running:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def parse_options():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("instances", nargs="+", help="directories or JSONL manifests")
+    parser.add_argument("--configs", nargs="+", choices=CONFIGS.keys(), required=True)
+    parser.add_argument("--time-limit", type=int, required=True, help="per run, in seconds")
+    parser.add_argument("--memory-limit", type=float, help="per run, in GB (default: budget / jobs)")
+    parser.add_argument("--memory-budget", type=float,
+                        help="for all parallel runs together, in GB (default: physical memory)")
+    parser.add_argument("--jobs", type=int, help="maximal number of parallel runs (default: number of CPUs)")
+    parser.add_argument("--output", type=absolute_path, required=True, help="JSONL file for the results")
+    parser.add_argument("--work-dir", type=absolute_path,
+                        help="directory for the run directories (default: next to the output)")
+    parser.add_argument("--keep-run-dirs", action="store_true")
+    parser.add_argument("--cache-dir", type=absolute_path,
+                        help="reuse compiled tasks from this directory (disabled by default)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+                        help="maximal size of the cache in MB (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_options()
+    cpus = sorted(os.sched_getaffinity(0))
+    num_jobs = args.jobs or len(cpus)
+    memory_budget = int((args.memory_budget or psutil.virtual_memory().total / GB) * GB)
+    memory_limit = int(args.memory_limit * GB) if args.memory_limit else memory_budget // num_jobs
+    num_slots = max(1, min(num_jobs, len(cpus), memory_budget // memory_limit))
+
+    finished = read_finished_runs(args.output)
+    jobs = [(col, dat, config)
+            for path in args.instances
+            for col, dat in find_instances(path)
+            for config in args.configs
+            if (col, dat, config) not in finished]
+    print(f"{len(jobs)} runs to do, {len(finished)} already done, {num_slots} in parallel", flush=True)
+
+    cache = None
+    if args.cache_dir is not None:
+        cache = TaskCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    work_dir = args.work_dir or str(Path(args.output).parent)
+    work_dir = tempfile.mkdtemp(prefix="batch_", dir=work_dir)
+    try:
+        Batch(jobs, args.output, num_slots, cpus, memory_limit, args.time_limit, work_dir,
+              cache, args.keep_run_dirs).run()
+    finally:
+        if not args.keep_run_dirs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
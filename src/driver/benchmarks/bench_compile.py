@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Compare wall time and peak memory of the streaming SAS writer and the
+Cheetah templates, and check that both produce the same file.
+Every compilation runs in a fresh process, so the peak RSS of one
+does not hide the other.
+
+Usage: bench_compile.py [--styles S ...] [instance_dir]
+"""
+
+import argparse
+import filecmp
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+DRIVER_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_INSTANCE_DIR = DRIVER_DIR.parent.parent / "container" / "test-instances"
+
+COMPILE_SNIPPET = """
+import sys
+sys.path.insert(0, {driver_dir!r})
+import compile
+compile.{function}(*sys.argv[1:])
+"""
+
+
+def run_compilation(function, style, col_filename, dat_filename, out_file):
+    code = COMPILE_SNIPPET.format(driver_dir=str(DRIVER_DIR), function=function)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code, style, col_filename, dat_filename, out_file])
+    _, status, rusage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    exit_code = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    if exit_code != 0:
+        sys.exit(f"{function} failed on {col_filename}")
+    # ru_maxrss is given in KiB on Linux.
+    return elapsed, rusage.ru_maxrss / 1024
+
+
+def find_instances(instance_dir):
+    for col_file in sorted(Path(instance_dir).glob("*.col")):
+        for dat_file in sorted(col_file.parent.glob(f"{col_file.stem}_*.dat")):
+            yield col_file, dat_file
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("instance_dir", nargs="?", default=DEFAULT_INSTANCE_DIR)
+    parser.add_argument("--styles", nargs="+", default=["single", "split", "split_tnf"])
+    args = parser.parse_args()
+
+    print(f"{'instance':<20} {'style':<10} "
+          f"{'template [s]':>12} {'[MB]':>8} {'writer [s]':>12} {'[MB]':>8} {'identical':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        template_sas = os.path.join(tmp_dir, "template.sas")
+        writer_sas = os.path.join(tmp_dir, "writer.sas")
+        for col_file, dat_file in find_instances(args.instance_dir):
+            for style in args.styles:
+                template_time, template_rss = run_compilation(
+                    "compile_from_template", style, str(col_file), str(dat_file), template_sas)
+                writer_time, writer_rss = run_compilation(
+                    "compile", style, str(col_file), str(dat_file), writer_sas)
+                identical = filecmp.cmp(template_sas, writer_sas, shallow=False)
+                print(f"{dat_file.stem:<20} {style:<10} "
+                      f"{template_time:>12.3f} {template_rss:>8.1f} "
+                      f"{writer_time:>12.3f} {writer_rss:>8.1f} {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
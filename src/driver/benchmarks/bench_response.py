@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Measure how long it takes to validate a plan on its own, to decode it into
+an answer file (which validates it in the same pass) and to write that
+answer out, for growing plan lengths. Only the write happens after the
+deadline, so its time is what TIME_BUFFER_FOR_RESPONSE has to cover. The
+peak memory should not grow with the plan length.
+
+Usage: bench_response.py [--tokens K] [--lengths L1 L2 ...]
+"""
+
+import argparse
+import os
+from pathlib import Path
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from array import array
+
+from configs import Response, decode_plan_file
+from compile import read_moves, validate_moves
+from graph import Graph
+
+
+def write_synthetic_plan(plan_file, num_tokens, length):
+    """
+    Move one token back and forth between two free nodes of a cycle with
+    one token on every other node. Return the graph and the initial and
+    goal state.
+    """
+    num_nodes = 2 * num_tokens + 2
+    nodes = array("i", range(num_nodes))
+    graph = Graph.from_edges(num_nodes, nodes, array("i", nodes[1:]) + array("i", [0]))
+    init = set(range(0, 2 * num_tokens, 2))
+    position, spare = 2 * num_tokens - 2, 2 * num_tokens
+    with open(plan_file, "w") as f:
+        for _ in range(length):
+            f.write(f"(pick {position})\n(place {spare})\n")
+            position, spare = spare, position
+        f.write(f"; cost = {2 * length} (unit cost)\n")
+    goal = set(init)
+    if length % 2 == 1:
+        goal.remove(2 * num_tokens - 2)
+        goal.add(2 * num_tokens)
+    return graph, init, goal
+
+
+def time_write(response):
+    with open(os.devnull, "w") as f:
+        started = time.perf_counter()
+        response.write(f)
+        f.flush()
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10**3, 10**4, 10**5, 10**6])
+    args = parser.parse_args()
+
+    print(f"{'length':>10} {'validate [s]':>12} {'decode [s]':>12} {'write [s]':>12} "
+          f"{'size [MB]':>12} {'peak RSS [MB]':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plan_file = Path(tmp_dir) / "sas_plan"
+        for length in args.lengths:
+            graph, init, goal = write_synthetic_plan(plan_file, args.tokens, length)
+            started = time.perf_counter()
+            with open(plan_file, "rb") as f:
+                assert validate_moves(graph, init, goal, read_moves(f))
+            validate_time = time.perf_counter() - started
+            started = time.perf_counter()
+            answer, cost = decode_plan_file(plan_file, graph, "", init, goal)
+            decode_time = time.perf_counter() - started
+            assert cost == length
+            response = Response(answer, cost, is_shortest=False, is_longest=False)
+            write_time = time_write(response)
+            size = answer.stat().st_size / 1024 / 1024
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            response.discard()
+            print(f"{length:>10} {validate_time:>12.3f} {decode_time:>12.3f} {write_time:>12.3f} "
+                  f"{size:>12.1f} {peak_rss:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+"""
+Generate families of synthetic instances for scaling studies.
+
+    generate_instances.py FAMILY --sizes N [N ...] --tokens K --output DIR
+
+FAMILY is one of
+    gnp          random graph G(n, p) with p = --density
+    grid         square grid with about n nodes
+    cycle-power  k-th power of the cycle C_n with k = --power
+    bipartite    random bipartite graph with sides n/2 and p = --density
+    chordal      intersection graph of n random subtrees of a random tree,
+                 with subtree radius up to --radius
+
+The tokens are placed according to --status:
+    yes      The target is reached from the start by moving every one of
+             --jumps tokens once. The shortest plan has exactly this many
+             jumps, since every token on S - T has to jump at least once.
+    no       Edges to the start tokens are added until every free node has
+             at least two token neighbours. Then no token can move, and the
+             instance is unsolvable for every other target.
+    unknown  Start and target are random independent sets.
+
+Every instance is written as NAME.col and NAME_01.dat, and DIR/manifest.jsonl
+lists all instances with their parameters and the known status and
+shortest plan length. The manifest can be passed to batch.py and
+run_benchmarks.py. Node names are shuffled, so the construction cannot be
+read off the node order. The same seed always produces the same instances.
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+import random
+import sys
+
+DRIVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(DRIVER_DIR))
+
+from compile import validate_moves
+from graph import Graph
+
+MAX_PLACEMENT_ATTEMPTS = 100
+
+
+def gnp_edges(n, rng, density):
+    # Skip over the missing edges with geometric jumps, so sparse graphs
+    # take time linear in the number of edges.
+    if density <= 0:
+        return []
+    if density >= 1:
+        return [(u, v) for v in range(n) for u in range(v)]
+    edges = []
+    log_q = math.log(1 - density)
+    v, w = 1, -1
+    while v < n:
+        w += 1 + int(math.log(1 - rng.random()) / log_q)
+        while w >= v and v < n:
+            w -= v
+            v += 1
+        if v < n:
+            edges.append((w, v))
+    return edges
+
+
+def grid_edges(n, rng, **_):
+    side = max(1, math.isqrt(n))
+    edges = []
+    for row in range(side):
+        for col in range(side):
+            v = row * side + col
+            if col + 1 < side:
+                edges.append((v, v + 1))
+            if row + 1 < side:
+                edges.append((v, v + side))
+    return side * side, edges
+
+
+def cycle_power_edges(n, rng, power):
+    return [(v, (v + d) % n) for v in range(n) for d in range(1, min(power, n // 2) + 1)
+            if v != (v + d) % n]
+
+
+def bipartite_edges(n, rng, density):
+    left = n // 2
+    return [(u, v) for u in range(left) for v in range(left, n) if rng.random() < density]
+
+
+def chordal_edges(n, rng, radius):
+    # Intersection graphs of subtrees of a tree are exactly the chordal graphs.
+    tree_size = max(1, n // 2)
+    tree = [[] for _ in range(tree_size)]
+    for v in range(1, tree_size):
+        parent = rng.randrange(v)
+        tree[v].append(parent)
+        tree[parent].append(v)
+    subtrees = []
+    for _ in range(n):
+        root = rng.randrange(tree_size)
+        depth = {root: 0}
+        queue = [root]
+        limit = rng.randint(0, radius)
+        for x in queue:
+            if depth[x] < limit:
+                for y in tree[x]:
+                    if y not in depth:
+                        depth[y] = depth[x] + 1
+                        queue.append(y)
+        subtrees.append(depth.keys())
+    members = [[] for _ in range(tree_size)]
+    for v, subtree in enumerate(subtrees):
+        for x in subtree:
+            members[x].append(v)
+    edges = set()
+    for nodes in members:
+        for i, u in enumerate(nodes):
+            for v in nodes[i + 1:]:
+                edges.add((u, v))
+    return sorted(edges)
+
+
+FAMILIES = {
+    "gnp": gnp_edges,
+    "grid": grid_edges,
+    "cycle-power": cycle_power_edges,
+    "bipartite": bipartite_edges,
+    "chordal": chordal_edges,
+}
+
+
+def random_independent_set(neighbours, size, rng, exclude=()):
+    """
+    Return a random independent set with size nodes that avoids the nodes
+    in exclude, or None if the random greedy choice got stuck.
+    """
+    nodes = list(range(len(neighbours)))
+    rng.shuffle(nodes)
+    chosen = set()
+    blocked = set(exclude)
+    for v in nodes:
+        if len(chosen) == size:
+            break
+        if v not in blocked:
+            chosen.add(v)
+            blocked.add(v)
+            blocked.update(neighbours[v])
+    return chosen if len(chosen) == size else None
+
+
+def place_solvable(neighbours, num_tokens, num_jumps, rng):
+    """
+    Move num_jumps different tokens of a random start once each, to free
+    nodes outside the start. Return start, target and the moves.
+    """
+    start = random_independent_set(neighbours, num_tokens, rng)
+    if start is None:
+        return None
+    tokens = set(start)
+    unmoved = sorted(start)
+    rng.shuffle(unmoved)
+    moves = []
+
+    def is_candidate(v):
+        return v not in start and v not in tokens and not tokens & neighbours[v]
+
+    for from_node in unmoved[:num_jumps]:
+        tokens.remove(from_node)
+        # Try random nodes first and only list all candidates if that fails,
+        # so large sparse graphs do not need a full scan per jump.
+        for _ in range(MAX_PLACEMENT_ATTEMPTS):
+            to_node = rng.randrange(len(neighbours))
+            if is_candidate(to_node):
+                break
+        else:
+            candidates = [v for v in range(len(neighbours)) if is_candidate(v)]
+            if not candidates:
+                return None
+            to_node = rng.choice(candidates)
+        tokens.add(to_node)
+        moves.append((from_node, to_node))
+    return start, tokens, moves
+
+
+def place_frozen(neighbours, edges, num_tokens, rng):
+    """
+    Add edges until the start is frozen and return start and target.
+    """
+    start = random_independent_set(neighbours, num_tokens, rng)
+    if start is None or num_tokens < 2:
+        return None
+    tokens = sorted(start)
+    for v in range(len(neighbours)):
+        if v in start:
+            continue
+        token_neighbours = neighbours[v] & start
+        while len(token_neighbours) < 2:
+            u = rng.choice(tokens)
+            if u not in token_neighbours:
+                token_neighbours.add(u)
+                neighbours[v].add(u)
+                neighbours[u].add(v)
+                edges.append((min(u, v), max(u, v)))
+    for _ in range(MAX_PLACEMENT_ATTEMPTS):
+        target = random_independent_set(neighbours, num_tokens, rng)
+        if target is not None and target != start:
+            return start, target
+    return None
+
+
+def generate_instance(family, n, params, num_tokens, status, num_jumps, rng):
+    result = FAMILIES[family](n, rng, **params)
+    if isinstance(result, tuple):
+        n, edges = result
+    else:
+        edges = result
+    neighbours = [set() for _ in range(n)]
+    for u, v in edges:
+        neighbours[u].add(v)
+        neighbours[v].add(u)
+
+    shortest_length = None
+    moves = None
+    for _ in range(MAX_PLACEMENT_ATTEMPTS):
+        if status == "yes":
+            placement = place_solvable(neighbours, num_tokens, num_jumps, rng)
+            if placement is not None:
+                start, target, moves = placement
+                shortest_length = len(moves)
+        elif status == "no":
+            placement = place_frozen(neighbours, edges, num_tokens, rng)
+        else:
+            start = random_independent_set(neighbours, num_tokens, rng)
+            target = random_independent_set(neighbours, num_tokens, rng)
+            placement = None if start is None or target is None else (start, target)
+        if placement is not None:
+            break
+    else:
+        return None
+    start, target = placement[0], placement[1]
+
+    names = list(range(n))
+    rng.shuffle(names)
+    edges = sorted(set((min(names[u], names[v]), max(names[u], names[v])) for u, v in edges))
+    start = set(names[v] for v in start)
+    target = set(names[v] for v in target)
+    if moves is not None:
+        moves = [(names[u], names[v]) for u, v in moves]
+        graph = Graph.from_edges(n, [u for u, _ in edges], [v for _, v in edges])
+        assert validate_moves(graph, start, target, moves)
+    return n, edges, start, target, shortest_length
+
+
+def write_instance(output_dir, name, num_nodes, edges, start, target):
+    col = output_dir / f"{name}.col"
+    dat = output_dir / f"{name}_01.dat"
+    with open(col, "w") as f:
+        f.write(f"p {num_nodes} {len(edges)}\n")
+        for u, v in edges:
+            f.write(f"e {u + 1} {v + 1}\n")
+    with open(dat, "w") as f:
+        f.write("s " + " ".join(str(v + 1) for v in sorted(start)) + "\n")
+        f.write("t " + " ".join(str(v + 1) for v in sorted(target)) + "\n")
+    return col, dat
+
+
+def get_family_params(family, args):
+    if family in ("gnp", "bipartite"):
+        return {"density": args.density}
+    if family == "cycle-power":
+        return {"power": args.power}
+    if family == "chordal":
+        return {"radius": args.radius}
+    return {}
+
+
+def parse_options():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("family", choices=FAMILIES.keys())
+    parser.add_argument("--sizes", type=int, nargs="+", required=True, help="numbers of nodes")
+    parser.add_argument("--tokens", type=int, required=True)
+    parser.add_argument("--status", choices=["yes", "no", "unknown"], default="yes")
+    parser.add_argument("--jumps", type=int, help="jumps of the shortest plan for --status yes (default: tokens)")
+    parser.add_argument("--instances", type=int, default=1, help="per size (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=0.1, help="edge probability for gnp and bipartite")
+    parser.add_argument("--power", type=int, default=2, help="for cycle-power")
+    parser.add_argument("--radius", type=int, default=2, help="maximal subtree radius for chordal")
+    parser.add_argument("--output", required=True, help="directory for the instances and the manifest")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_options()
+    num_jumps = args.tokens if args.jumps is None else args.jumps
+    if args.status == "yes" and not 0 <= num_jumps <= args.tokens:
+        sys.exit("--jumps must be between 0 and --tokens")
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    params = get_family_params(args.family, args)
+    with open(output_dir / "manifest.jsonl", "a") as manifest:
+        for n in args.sizes:
+            for i in range(args.instances):
+                name = f"{args.family}-{n}-{args.tokens}-{args.status}-s{args.seed}-{i + 1:02d}"
+                # String seeds are hashed deterministically, unlike tuples.
+                rng = random.Random(f"{name}-{sorted(params.items())}")
+                instance = generate_instance(args.family, n, params, args.tokens, args.status, num_jumps, rng)
+                if instance is None:
+                    print(f"{name}: could not place {args.tokens} tokens, skipped", file=sys.stderr)
+                    continue
+                num_nodes, edges, start, target, shortest_length = instance
+                col, dat = write_instance(output_dir, name, num_nodes, edges, start, target)
+                entry = {
+                    "col": col.name,
+                    "dat": dat.name,
+                    "family": args.family,
+                    "params": params,
+                    "nodes": num_nodes,
+                    "edges": len(edges),
+                    "tokens": args.tokens,
+                    "seed": args.seed,
+                    "status": {"yes": "YES", "no": "NO"}.get(args.status, "UNKNOWN"),
+                    "shortest_length": shortest_length,
+                }
+                manifest.write(json.dumps(entry) + "\n")
+                print(f"{name}: {num_nodes} nodes, {len(edges)} edges")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+"""
+Run configs on a fixed instance set and compare the results to a baseline.
+
+    run_benchmarks.py run [INSTANCES ...] --output RESULTS [--configs ...]
+    run_benchmarks.py compare BASELINE RESULTS
+
+"run" executes run.py for every instance and config (by default all
+CONFIGS on container/test-instances) with fixed limits, one run at a time
+so timings are comparable. It records the answer, the plan length, the
+time to the first and the best plan, and the peak memory of every
+component (see run.py --stats).
+
+"compare" pairs the runs of both files by instance and config and reports,
+per config, the solved instances, the plan quality and the time to
+solution. Times are summarized by the geometric mean of the per-instance
+ratios and tested with a Wilcoxon signed-rank test. The exit code is 1 if
+there is a regression: a wrong or lost answer, a worse plan, or a
+significant slowdown beyond the tolerance. Manifests written by
+generate_instances.py also give the known answer and shortest plan length
+of their instances, and runs that contradict them are reported as well.
+"""
+
+import argparse
+import datetime
+import json
+import math
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+
+DRIVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(DRIVER_DIR))
+
+from batch import find_instances, parse_answer
+from configs import CONFIGS, LONGEST_TRACK, SHORTEST_TRACK
+
+DEFAULT_INSTANCES = DRIVER_DIR.parent.parent / "container" / "test-instances"
+RUN_PY = DRIVER_DIR / "run.py"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=DRIVER_DIR, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_expected_answers(path):
+    """
+    Return a dictionary mapping the dat files of a manifest to their known
+    status and shortest plan length.
+    """
+    path = Path(path).resolve()
+    expected = {}
+    if path.is_dir():
+        return expected
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get("status", "UNKNOWN") != "UNKNOWN":
+                    dat = str((path.parent / entry["dat"]).resolve())
+                    expected[dat] = (entry["status"], entry.get("shortest_length"))
+    return expected
+
+
+def run_once(config, col, dat, time_limit, memory_limit):
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp_dir:
+        stats_filename = Path(tmp_dir) / "stats.json"
+        answer_filename = Path(tmp_dir) / "answer.txt"
+        cmd = [sys.executable, str(RUN_PY), "--config", config,
+               "--time-limit", str(time_limit), "--memory-limit", str(memory_limit),
+               "--stats", str(stats_filename), col, dat]
+        with open(answer_filename, "w") as out:
+            subprocess.run(cmd, cwd=tmp_dir, stdout=out, stderr=subprocess.DEVNULL)
+        status, length = parse_answer(answer_filename)
+        try:
+            stats = json.loads(stats_filename.read_text())
+        except (OSError, json.JSONDecodeError):
+            stats = {}
+    return {
+        "status": status,
+        "length": length,
+        "time": stats.get("total_time"),
+        "first_plan_time": stats.get("first_plan_time"),
+        "best_plan_time": stats.get("best_plan_time"),
+        "components": stats.get("components", []),
+    }
+
+
+def run_benchmarks(args):
+    instances = [pair for path in args.instances for pair in find_instances(path)]
+    expected = {}
+    for path in args.instances:
+        expected.update(read_expected_answers(path))
+    runs = []
+    for col, dat in instances:
+        for config in args.configs:
+            for repeat in range(args.repeats):
+                run = run_once(config, col, dat, args.time_limit, args.memory_limit)
+                run.update(instance=Path(dat).name, config=config, repeat=repeat)
+                if dat in expected:
+                    run["expected_status"], run["expected_length"] = expected[dat]
+                runs.append(run)
+                print(f"{run['status']:7} {run['time'] or 0:8.2f}s  {config}  {run['instance']}", flush=True)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "time_limit": args.time_limit,
+            "memory_limit": args.memory_limit,
+            "repeats": args.repeats,
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+
+
+def summarize_runs(runs):
+    """
+    Group repeated runs by (config, instance): times are replaced by their
+    medians, and "answers" lists the distinct answers and plan lengths of
+    the repeats that solved the instance, which compare checks for
+    agreement.
+    """
+    groups = {}
+    for run in runs:
+        groups.setdefault((run["config"], run["instance"]), []).append(run)
+    summary = {}
+    for key, group in groups.items():
+        def median(field):
+            # Results of older versions may lack a field.
+            values = [run.get(field) for run in group if run.get(field) is not None]
+            return statistics.median(values) if values else None
+        solved = [run for run in group if run["status"] != "UNKNOWN"]
+        peak_memory = [max((c["peak_rss_kb"] for c in run["components"]), default=0) for run in group]
+        summary[key] = {
+            "status": solved[0]["status"] if solved else "UNKNOWN",
+            "length": solved[0]["length"] if solved else None,
+            "answers": sorted(set((run["status"], run["length"]) for run in solved)),
+            "time": median("time"),
+            "first_plan_time": median("first_plan_time"),
+            "best_plan_time": median("best_plan_time"),
+            "peak_rss_kb": max(peak_memory, default=0),
+            "expected_status": group[0].get("expected_status"),
+            "expected_length": group[0].get("expected_length"),
+        }
+    return summary
+
+
+def complete_pairs(pairs):
+    # Runs without statistics have no times.
+    return [(old, new) for old, new in pairs if old is not None and new is not None]
+
+
+def geometric_mean_ratio(pairs):
+    # Times below 10ms are dominated by noise.
+    ratios = [max(new, 0.01) / max(old, 0.01) for old, new in complete_pairs(pairs)]
+    if not ratios:
+        return None
+    return math.exp(sum(math.log(r) for r in ratios) / len(ratios))
+
+
+def wilcoxon_signed_rank(pairs):
+    """
+    Return the two-sided p-value of the Wilcoxon signed-rank test for paired
+    samples, using the normal approximation.
+    """
+    diffs = [new - old for old, new in complete_pairs(pairs) if new != old]
+    n = len(diffs)
+    if n == 0:
+        return 1.0
+    order = sorted(range(n), key=lambda i: abs(diffs[i]))
+    ranks = [0.0] * n
+    tie_correction = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and abs(diffs[order[j + 1]]) == abs(diffs[order[i]]):
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        tie_correction += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    w_plus = sum(rank for rank, d in zip(ranks, diffs) if d > 0)
+    mean = n * (n + 1) / 4
+    variance = n * (n + 1) * (2 * n + 1) / 24 - tie_correction / 48
+    if variance <= 0:
+        return 1.0
+    z = (w_plus - mean) / math.sqrt(variance)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def is_worse_plan(track, old_length, new_length):
+    if track == SHORTEST_TRACK:
+        return new_length > old_length
+    if track == LONGEST_TRACK:
+        return new_length < old_length
+    return False
+
+
+def repeats_disagree(track, answers):
+    """
+    Check if the repeats that solved an instance gave different answers,
+    or plans of different lengths on the tracks that optimize the length.
+    """
+    if track not in (SHORTEST_TRACK, LONGEST_TRACK):
+        answers = set(status for status, _ in answers)
+    return len(answers) > 1
+
+
+def contradicts_expected_answer(track, run):
+    if run["expected_status"] is None or run["status"] == "UNKNOWN":
+        return False
+    if run["status"] != run["expected_status"]:
+        return True
+    # Shorter plans than the known optimum would be invalid.
+    expected_length = run["expected_length"]
+    if run["status"] == "YES" and expected_length is not None:
+        return run["length"] < expected_length or (track == SHORTEST_TRACK and run["length"] > expected_length)
+    return False
+
+
+def compare(args):
+    baseline = summarize_runs(json.loads(Path(args.baseline).read_text())["runs"])
+    current = summarize_runs(json.loads(Path(args.results).read_text())["runs"])
+    regressions = []
+    for config in sorted(set(c for c, _ in baseline) & set(c for c, _ in current)):
+        track = CONFIGS[config].track if config in CONFIGS else None
+        instances = sorted(i for c, i in baseline if c == config and (c, i) in current)
+        old_solved = new_solved = 0
+        time_pairs, first_plan_pairs, best_plan_pairs, memory_pairs = [], [], [], []
+        for instance in instances:
+            old, new = baseline[(config, instance)], current[(config, instance)]
+            if repeats_disagree(track, new["answers"]):
+                answers = ", ".join(f"{status} {length}" for status, length in new["answers"])
+                regressions.append(f"{config} {instance}: repeats disagree ({answers})")
+            if contradicts_expected_answer(track, new):
+                regressions.append(f"{config} {instance}: {new['status']} {new['length']} contradicts "
+                                   f"the known answer {new['expected_status']} {new['expected_length']}")
+            old_solved += old["status"] != "UNKNOWN"
+            new_solved += new["status"] != "UNKNOWN"
+            if "UNKNOWN" not in (old["status"], new["status"]) and old["status"] != new["status"]:
+                regressions.append(f"{config} {instance}: answer changed from {old['status']} to {new['status']}")
+            elif old["status"] != "UNKNOWN" and new["status"] == "UNKNOWN":
+                regressions.append(f"{config} {instance}: no longer solved")
+            elif old["status"] == new["status"] == "YES" and is_worse_plan(track, old["length"], new["length"]):
+                regressions.append(f"{config} {instance}: plan length {old['length']} -> {new['length']}")
+            if old["status"] != "UNKNOWN" and new["status"] != "UNKNOWN" and None not in (old["time"], new["time"]):
+                time_pairs.append((old["time"], new["time"]))
+                if old["first_plan_time"] is not None and new["first_plan_time"] is not None:
+                    first_plan_pairs.append((old["first_plan_time"], new["first_plan_time"]))
+                if old["best_plan_time"] is not None and new["best_plan_time"] is not None:
+                    best_plan_pairs.append((old["best_plan_time"], new["best_plan_time"]))
+            memory_pairs.append((old["peak_rss_kb"] / 1024, new["peak_rss_kb"] / 1024))
+
+        time_ratio = geometric_mean_ratio(time_pairs)
+        p_value = wilcoxon_signed_rank(time_pairs)
+        print(f"{config} ({len(instances)} instances)")
+        print(f"  solved:              {old_solved} -> {new_solved}")
+        if time_ratio is not None:
+            print(f"  time to solution:    x{time_ratio:.3f} (geometric mean, {len(time_pairs)} instances, p={p_value:.3f})")
+        first_plan_ratio = geometric_mean_ratio(first_plan_pairs)
+        if first_plan_ratio is not None:
+            print(f"  time to first plan:  x{first_plan_ratio:.3f}")
+        best_plan_ratio = geometric_mean_ratio(best_plan_pairs)
+        if best_plan_ratio is not None:
+            print(f"  time to best plan:   x{best_plan_ratio:.3f}")
+        memory_ratio = geometric_mean_ratio(memory_pairs)
+        if memory_ratio is not None:
+            print(f"  peak memory:         x{memory_ratio:.3f}")
+        if time_ratio is not None and time_ratio > 1 + args.tolerance and p_value < args.significance:
+            regressions.append(f"{config}: time to solution x{time_ratio:.3f} (p={p_value:.3f})")
+
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+def parse_options():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("instances", nargs="*", default=[str(DEFAULT_INSTANCES)],
+                            help="directories or JSONL manifests (default: container/test-instances)")
+    run_parser.add_argument("--configs", nargs="+", choices=CONFIGS.keys(), default=list(CONFIGS.keys()))
+    run_parser.add_argument("--time-limit", type=int, default=60)
+    run_parser.add_argument("--memory-limit", type=int, default=4, help="in GB")
+    run_parser.add_argument("--repeats", type=int, default=1)
+    run_parser.add_argument("--output", required=True)
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1,
+                                help="accepted relative slowdown (default: %(default)s)")
+    compare_parser.add_argument("--significance", type=float, default=0.05)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_options()
+    if args.command == "run":
+        run_benchmarks(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
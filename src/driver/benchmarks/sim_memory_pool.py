@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+Simulate portfolio components with different memory profiles and check
+which of them run out of memory with a static split of the memory limit
+and with the elastic memory pool.
+
+The profiles mimic the components of our portfolios: one finishes early
+(like the MIP checker), one needs little memory (like Scorpion on many
+instances) and one keeps growing (like SymK building BDDs). With a static
+split, the growing component dies at its share; with the pool, it can use
+the memory the others do not need. The script exits with a non-zero
+status if the growing component does not run out of memory with the
+static split or does not finish with the pool.
+
+Usage: sim_memory_pool.py [--memory-limit MB] [--target MB]
+"""
+
+import argparse
+from pathlib import Path
+import psutil
+import sys
+import tempfile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from configs import MemoryPool, PlannerCommand
+
+MB = 1024 * 1024
+
+# Each component allocates memory in chunks of 10 MB and reports how much it
+# holds in its log. A MemoryError ends the component with exit code 1.
+COMPONENT = """
+import sys, time
+chunks = []
+def grow_to(mb, delay):
+    while len(chunks) * 10 < mb:
+        chunks.append(bytearray(10 * 1024 * 1024))
+        print(len(chunks) * 10, flush=True)
+        time.sleep(delay)
+try:
+    {profile}
+except MemoryError:
+    sys.exit(1)
+"""
+
+PROFILES = {
+    "early-exit": "grow_to(100, 0.01); time.sleep(0.5)",
+    "flat": "grow_to(100, 0.01); time.sleep(4)",
+    "growing": "time.sleep(0.6); grow_to({target}, 0.02); time.sleep(0.5)",
+}
+
+
+def simulate(memory_limit, target, elastic):
+    components = [
+        PlannerCommand([sys.executable, "-c", COMPONENT.format(profile=profile.format(target=target))])
+        for profile in PROFILES.values()]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processes = []
+        for name, component in zip(PROFILES, components):
+            run_dir = Path(tmp_dir) / name
+            run_dir.mkdir()
+            processes.append(component.start(
+                str(run_dir), memory_limit // len(components), 60, "", "", "", None))
+        if elastic:
+            pool = MemoryPool(processes, memory_limit)
+            pool.start()
+        psutil.wait_procs(processes)
+        if elastic:
+            pool.stop()
+        returncodes = {}
+        for name, process in zip(PROFILES, processes):
+            lines = (Path(process.run_dir) / "run.log").read_text().split()
+            peak = lines[-1] if lines else "0"
+            status = "ok" if process.returncode == 0 else "out of memory"
+            print(f"  {name:12} {peak:>5} MB  {status}")
+            returncodes[name] = process.returncode
+    return returncodes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--memory-limit", type=int, default=1200, help="shared limit in MB")
+    parser.add_argument("--target", type=int, default=700, help="MB the growing component needs")
+    args = parser.parse_args()
+    print("static split")
+    static = simulate(args.memory_limit * MB, args.target, elastic=False)
+    print("elastic memory pool")
+    elastic = simulate(args.memory_limit * MB, args.target, elastic=True)
+    if static["growing"] == 0:
+        sys.exit("the growing component did not hit its limit with the static split; "
+                 "increase --target")
+    if elastic["growing"] != 0:
+        sys.exit("the growing component did not finish with the elastic memory pool")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import shutil
+import tempfile
+import time
+
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+# Part of every key. Bump it whenever the format of a cached artefact
+# changes, so old entries are no longer found and age out of the cache.
+CACHE_VERSION = "1"
+# Temporary build files of this age are left over from drivers that died
+# during a build and are removed on eviction.
+STALE_TMP_AGE = 24 * 60 * 60
+
+
+def file_digest(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def link_or_copy(path, destination):
+    try:
+        os.link(path, destination)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Cache and run directory are on different file systems.
+        shutil.copyfile(path, destination)
+
+
+class TaskCache(object):
+    """
+    Content-addressed cache for compiled tasks and other artefacts derived
+    from the input files. Every entry is a directory named by a key that
+    hashes everything the artefacts depend on (see `key`). Entries are
+    evicted in least-recently-used order once the cache grows beyond
+    `max_size` bytes.
+
+    Several drivers may share a cache directory: files are moved into place
+    atomically, and evicting an entry does not affect run directories that
+    already link to its files.
+    """
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256("\0".join((CACHE_VERSION,) + parts).encode()).hexdigest()
+
+    def _entry_dir(self, key):
+        return self.cache_dir / key
+
+    def _lookup(self, key, name):
+        path = self._entry_dir(key) / name
+        if not path.exists():
+            return None
+        # The modification time of the entry directory is used for the LRU order.
+        try:
+            os.utime(self._entry_dir(key))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _store(self, key, name, build):
+        """
+        Call build(path) to create the artefact in a temporary file and move
+        it into the cache.
+        """
+        entry_dir = self._entry_dir(key)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            build(tmp_path)
+            entry_dir.mkdir(exist_ok=True)
+            path = entry_dir / name
+            os.replace(tmp_path, path)
+        except:
+            os.unlink(tmp_path)
+            raise
+        os.utime(entry_dir)
+        self.evict(keep=entry_dir)
+        return path
+
+    def restore_file(self, key, name, destination):
+        """
+        Place the artefact `name` of entry `key` at `destination` and return
+        True, or return False if it is not cached.
+        """
+        path = self._lookup(key, name)
+        if path is None:
+            return False
+        try:
+            link_or_copy(path, destination)
+        except FileNotFoundError:
+            # Evicted in the meantime.
+            return False
+        return True
+
+    def store_file(self, key, name, path):
+        """
+        Copy the file at `path` into the cache as artefact `name` of entry
+        `key`, replacing the cached version.
+        """
+        self._store(key, name, lambda tmp_path: shutil.copyfile(path, tmp_path))
+
+    def get_file(self, key, name, build, destination):
+        """
+        Place the artefact `name` of entry `key` at `destination`, building
+        it with build(path) if it is not cached yet.
+        """
+        if not self.restore_file(key, name, destination):
+            link_or_copy(self._store(key, name, build), destination)
+
+    def get_object(self, key, name, compute):
+        """
+        Return the pickled artefact `name` of entry `key`, computing it with
+        compute() if it is not cached yet.
+        """
+        path = self._lookup(key, name)
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    return pickle.load(f)
+            except Exception:
+                # Evicted, broken or stale (e.g., pickled from classes that
+                # changed since), recompute it and overwrite the entry.
+                pass
+        obj = compute()
+
+        def build(tmp_path):
+            with open(tmp_path, "wb") as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, name, build)
+        return obj
+
+    def _entries(self):
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            if not entry_dir.is_dir() or entry_dir.name.startswith(".tmp_"):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry_dir.iterdir())
+                entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                # Evicted by another driver.
+                continue
+        return entries
+
+    def _remove_stale_tmp_files(self):
+        stale_time = time.time() - STALE_TMP_AGE
+        for path in self.cache_dir.glob(".tmp_*"):
+            try:
+                if path.stat().st_mtime > stale_time:
+                    continue
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink()
+            except FileNotFoundError:
+                # Moved into place or removed by another driver.
+                continue
+
+    def evict(self, keep=None):
+        self._remove_stale_tmp_files()
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total_size <= self.max_size:
+                break
+            if entry_dir == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
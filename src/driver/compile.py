@@ -1,105 +1,303 @@
 #!/usr/bin/env python3
 
-from Cheetah.Template import Template
-from collections import defaultdict
+from bisect import bisect_left
+import itertools
 import os
+from pathlib import Path
 import sys
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / "common"))
+from graph import parse_col_file, parse_dat_file, to_node_id, to_var_id
 
-def to_var_id(node):
-    return int(node) - 1
-
-def to_node_id(var_id):
-    return str(int(var_id) + 1)
-
-
-def parse_col_file(filename):
-    with open(filename) as f:
-        graph = defaultdict(set)
-        num_nodes, num_edges = None, None
-        num_parsed_edges = 0
-        for line in f:
-            args = line.split()
-            assert args[0] == "c" or len(args) == 3
-            if args[0] == "p":
-                num_nodes, num_edges = int(args[1]), int(args[2])
-            elif args[0] == "e":
-                num_parsed_edges += 1
-                v0, v1 = to_var_id(args[1]), to_var_id(args[2])
-                assert 0 <= v0 <  num_nodes
-                assert 0 <= v1 <  num_nodes
-                graph[v0].add(v1)
-                graph[v1].add(v0)
-    assert num_edges == num_parsed_edges
-    return graph
-
-
-def parse_dat_file(filename):
-    start, target = None, None
-    with open(filename) as f:
-        for line in f:
-            args = line.split()
-            if args[0] == "s":
-                start = set([to_var_id(x) for x in args[1:]])
-            if args[0] == "t":
-                target = set([to_var_id(x) for x in args[1:]])
-    return start, target
+SAS_FILE_BUFFER_SIZE = 1024 * 1024
 
 
 def fill_template(template_filename, out_file, **kwargs):
+    """
+    Reference implementation of the encodings, kept to compare the output
+    and performance of the SAS writer below (see benchmarks/bench_compile.py).
+    """
+    from Cheetah.Template import Template
     template = Template(file=template_filename, searchList=[kwargs])
     with open(out_file, "w") as f:
         f.write(str(template))
 
 
+def compile_from_template(style, col_filename, dat_filename, outfile):
+    template_file = os.path.join(os.path.dirname(__file__), f"sas_file_{style}.tmpl")
+    graph = parse_col_file(col_filename)
+    start, target = parse_dat_file(dat_filename)
+    fill_template(template_file, outfile, graph=graph, start=start, target=target)
+
+
+# The writers below produce exactly the same output as the templates
+# sas_file_*.tmpl, but stream it to the file instead of building it in memory.
+
+def write_header(f):
+    f.write("begin_version\n3\nend_version\nbegin_metric\n0\nend_metric\n")
+
+
+def write_node_variables(f, nodes):
+    for node in nodes:
+        f.write(f"begin_variable\nnode_{node}\n-1\n2\n"
+                f"Atom node_{node}_free()\nAtom node_{node}_occupied()\n"
+                "end_variable\n")
+
+
+def write_hand_variable(f):
+    f.write("begin_variable\nhand\n-1\n2\nAtom empty()\nAtom full()\nend_variable\n")
+
+
+def write_initial_state(f, nodes, start, with_hand):
+    f.write("begin_state\n")
+    f.write("".join("1\n" if node in start else "0\n" for node in nodes))
+    if with_hand:
+        # The hand always starts empty.
+        f.write("0\n")
+    f.write("end_state\n")
+
+
+def write_pick_and_place_operators(f, graph, nodes, hand):
+    f.write(f"{2 * len(nodes)}\n")
+    for node in nodes:
+        f.write(f"begin_operator\npick {node}\n0\n2\n0 {node} 1 0\n0 {hand} 0 1\n0\nend_operator\n")
+    for node in nodes:
+        # Neighbors of node must be empty so adding a token there does not
+        # violate the condition of an independent set.
+        neighbors = graph[node]
+        f.write(f"begin_operator\nplace {node}\n{len(neighbors)}\n")
+        f.write("".join(f"{neighbor} 0\n" for neighbor in neighbors))
+        f.write(f"2\n0 {node} 0 1\n0 {hand} 1 0\n0\nend_operator\n")
+
+
+def write_single(f, graph, start, target):
+    nodes = sorted(graph)
+    write_header(f)
+    f.write(f"{len(nodes)}\n")
+    write_node_variables(f, nodes)
+    f.write("0\n")
+    write_initial_state(f, nodes, start, with_hand=False)
+    f.write(f"begin_goal\n{len(target)}\n")
+    f.write("".join(f"{node} 1\n" for node in sorted(target)))
+    f.write("end_goal\n")
+    f.write(f"{len(nodes)**2 - len(nodes)}\n")
+    for from_node in nodes:
+        for to_node in nodes:
+            if from_node == to_node:
+                continue
+            # Neighbors of to_node must be empty, except for from_node whose
+            # value changes from occupied to free.
+            prevail = [neighbor for neighbor in graph[to_node] if neighbor != from_node]
+            f.write(f"begin_operator\nmove {from_node} {to_node}\n{len(prevail)}\n")
+            f.write("".join(f"{neighbor} 0\n" for neighbor in prevail))
+            f.write(f"2\n0 {from_node} 1 0\n0 {to_node} 0 1\n0\nend_operator\n")
+    f.write("0\n")
+
+
+def write_split(f, graph, start, target, total_goal):
+    nodes = sorted(graph)
+    hand = len(nodes)
+    write_header(f)
+    f.write(f"{len(nodes) + 1}\n")
+    write_node_variables(f, nodes)
+    write_hand_variable(f)
+    f.write("0\n")
+    write_initial_state(f, nodes, start, with_hand=True)
+    if total_goal:
+        # Mention the value of every node in the goal (transition normal form).
+        f.write(f"begin_goal\n{len(nodes) + 1}\n")
+        f.write("".join(f"{node} 1\n" if node in target else f"{node} 0\n" for node in nodes))
+    else:
+        f.write(f"begin_goal\n{len(target) + 1}\n")
+        f.write("".join(f"{node} 1\n" for node in sorted(target)))
+    # The hand must be empty at the end.
+    f.write(f"{hand} 0\nend_goal\n")
+    write_pick_and_place_operators(f, graph, nodes, hand)
+    f.write("0\n")
+
+
+def write_sas_file(style, graph, start, target, out_file):
+    with open(out_file, "w", buffering=SAS_FILE_BUFFER_SIZE) as f:
+        if style == "single":
+            write_single(f, graph, start, target)
+        elif style == "split":
+            write_split(f, graph, start, target, total_goal=False)
+        elif style == "split_tnf":
+            write_split(f, graph, start, target, total_goal=True)
+        else:
+            raise ValueError(f"Unknown encoding style '{style}'")
+
+
 def compile(style, col_filename, dat_filename, outfile):
-    if style == "single":
-        template_file = "sas_file_single.tmpl"
-    elif style == "split":
-        template_file = "sas_file_split.tmpl"
-    elif style == "split_tnf":
-        template_file = "sas_file_split_tnf.tmpl"
-    template_file = os.path.join(os.path.dirname(__file__), template_file)
     graph = parse_col_file(col_filename)
     start, target = parse_dat_file(dat_filename)
-    fill_template(template_file, outfile, **locals())
+    write_sas_file(style, graph, start, target, outfile)
 
-def pairs(sequence):
-    elements = iter(sequence)
+# Plans are parsed in blocks of about this many bytes, so memory does not
+# grow with the length of the plan.
+PLAN_BLOCK_SIZE = 1024 * 1024
+
+def read_moves(plan_file):
+    """
+    Turn the pick and place actions of a plan file (style split), opened in
+    binary mode, into jumps (from_node, to_node), given as var ids. The file
+    is parsed in blocks of complete pairs of actions with bytes operations,
+    not line by line. Reading stops at the cost line that ends every plan
+    file.
+    """
+    return itertools.chain.from_iterable(read_move_blocks(plan_file))
+
+
+def read_move_blocks(plan_file):
+    rest = b""
     while True:
-        try:
-            a = next(elements)
-            b = next(elements)
-            yield (a, b)
-        except StopIteration:
+        block = plan_file.read(PLAN_BLOCK_SIZE)
+        data = rest + block
+        end = data.find(b";")
+        if end < 0 and block:
+            # Cut after an even number of lines, so no pair is split.
+            end = data.rfind(b"\n") + 1
+            if data.count(b"\n", 0, end) % 2:
+                end = data.rfind(b"\n", 0, end - 1) + 1
+        elif end < 0:
+            end = len(data)
+        data, rest = data[:end], data[end:]
+        if data:
+            yield parse_move_block(data)
+        if rest.startswith(b";") or not block:
             return
 
-def parse_action_parameter(action, expected_name):
-    assert(len(action) > 2 and action[0] == "(" and action[-1] == ")" and " " in action)
-    name, param = action[1:-1].split()
-    assert(name == expected_name)
-    return param
-
-
-def answer_line(tokenization):
-    return 'a ' + ' '.join(str(i) for i  in sorted(int(t) for t in tokenization))
-
-def decode_plan(actions, initial_state, goal_state):
-    # Only works for style split for now
-    state = set(initial_state)
-    cost = 0
-    lines = ["a YES", answer_line(state)]
-    for pick_action, place_action in pairs(actions):
-        pick_from = to_node_id(parse_action_parameter(pick_action, "pick"))
-        place_to = to_node_id(parse_action_parameter(place_action, "place"))
-        state.remove(pick_from)
-        state.add(place_to)
-        lines.append(answer_line(state))
-        cost += 1
-    if state == set(goal_state):
-        return "\n".join(lines), cost
-    else:
-        return None, None
+
+JUMP_SEPARATORS = bytes.maketrans(b"|#", b"  ")
+
+def parse_move_block(data):
+    """
+    Parse complete pairs of pick and place actions. The line breaks between
+    the actions are replaced by separators, "|" within a jump and "#"
+    between jumps, so the whole block must turn into "(pick A|B#C|D...)".
+    Removing the digits checks this in a single comparison.
+    """
+    joined = data.replace(b")\n(place ", b"|").replace(b")\n(pick ", b"#")
+    num_moves = joined.count(b"|")
+    if joined.translate(None, b"0123456789") != b"(pick " + b"|#" * (num_moves - 1) + b"|)\n":
+        raise ValueError(f"Unexpected actions in plan: {data[:80]!r}")
+    nodes = list(map(int, joined[6:-2].translate(JUMP_SEPARATORS).split()))
+    if len(nodes) != 2 * num_moves:
+        raise ValueError(f"Unexpected actions in plan: {data[:80]!r}")
+    nodes = iter(nodes)
+    return list(zip(nodes, nodes))
+
+
+# Up to this number of nodes, the validator keeps the tokens in a bitmask
+# and checks each jump with a few integer operations. On larger graphs the
+# bitmasks get too expensive, and it checks the neighbours of each target.
+BITMASK_VALIDATION_MAX_NODES = 4096
+
+def jump_checker(graph, initial_state):
+    """
+    Return two functions over a copy of the token set: apply_jumps(moves)
+    applies the jumps in order and returns False at the first one that does
+    not move a token to a free node without tokens on its neighbours, and
+    is_occupied(node) tells whether a node holds a token. Jumps are checked
+    in batches, so the loop over them stays tight.
+    """
+    if graph.num_nodes <= BITMASK_VALIDATION_MAX_NODES:
+        bits = [1 << v for v in range(graph.num_nodes)]
+        # A token may only jump to a node if the node and its neighbours are free.
+        blocked = [mask | bit for mask, bit in zip(graph.neighbour_masks(), bits)]
+        tokens = 0
+        for v in initial_state:
+            tokens |= bits[v]
+
+        def apply_jumps(moves):
+            nonlocal tokens
+            current = tokens
+            try:
+                for from_node, to_node in moves:
+                    bit = bits[from_node]
+                    if not current & bit:
+                        return False
+                    current ^= bit
+                    if current & blocked[to_node]:
+                        return False
+                    current |= bits[to_node]
+            finally:
+                tokens = current
+            return True
+
+        return apply_jumps, lambda v: bool(tokens & bits[v])
+
+    occupied = bytearray(graph.num_nodes)
+    for v in initial_state:
+        occupied[v] = 1
+    offsets, neighbours = graph.offsets, graph.neighbours
+
+    def apply_jumps(moves):
+        for from_node, to_node in moves:
+            if not occupied[from_node] or occupied[to_node]:
+                return False
+            occupied[from_node] = 0
+            for i in range(offsets[to_node], offsets[to_node + 1]):
+                if occupied[neighbours[i]]:
+                    return False
+            occupied[to_node] = 1
+        return True
+
+    return apply_jumps, occupied.__getitem__
+
+
+def validate_moves(graph, initial_state, goal_state, moves):
+    """
+    Check that every jump moves a token to a free node that has no token
+    on its neighbours, i.e., that all intermediate token sets are
+    independent, and that the jumps end in the goal state.
+    """
+    apply_jumps, is_occupied = jump_checker(graph, initial_state)
+    return apply_jumps(moves) and all(is_occupied(v) for v in goal_state)
+
+
+# The answer lines are written in batches of this many lines.
+ANSWER_LINES_PER_WRITE = 4096
+
+def write_answer(out, initial_state, moves, graph=None, goal_state=None):
+    """
+    Write the answer lines of a plan to the stream out and return the number
+    of jumps. The tokens are kept sorted, so each jump costs one removal and
+    one insertion, and memory only depends on the number of tokens, not on
+    the length of the plan.
+
+    If a graph is given, every batch of jumps is validated like in
+    validate_moves before it is written, and the function returns None for
+    invalid plans. out then holds a partial answer.
+    """
+    tokens = sorted(v + 1 for v in initial_state)
+    names = [str(token) for token in tokens]
+    out.write("a YES\na " + " ".join(names) + "\n")
+    if graph is not None:
+        apply_jumps, is_occupied = jump_checker(graph, initial_state)
+    moves = iter(moves)
+    num_moves = 0
+    while True:
+        batch = list(itertools.islice(moves, ANSWER_LINES_PER_WRITE))
+        if not batch:
+            break
+        if graph is not None and not apply_jumps(batch):
+            return None
+        lines = []
+        for pick_from, place_to in batch:
+            i = bisect_left(tokens, pick_from + 1)
+            del tokens[i]
+            del names[i]
+            i = bisect_left(tokens, place_to + 1)
+            tokens.insert(i, place_to + 1)
+            names.insert(i, to_node_id(place_to))
+            lines.append("a " + " ".join(names))
+        lines.append("")
+        out.write("\n".join(lines))
+        num_moves += len(batch)
+    if graph is not None and not all(is_occupied(v) for v in goal_state):
+        return None
+    return num_moves
 
 if __name__ == "__main__":
     compile(*sys.argv[1:])
@@ -1,10 +1,19 @@
+import json
+import math
 from natsort import natsorted
+import os
 from pathlib import Path
 import psutil
 import re
 import resource
+import shutil
+import signal
+import tempfile
+import threading
+import time
 
-from compile import decode_plan
+from compile import read_moves, to_var_id, write_answer
+from tracing import NULL_TRACER
 
 SCRIPT_DIR = Path(__file__).parent
 SOLVER_DIR = SCRIPT_DIR.parent
@@ -18,19 +27,61 @@ EXISTENT_TRACK = "existent"
 
 EXIT_SUCCESS = 0
 EXIT_SEARCH_UNSOLVED_INCOMPLETE = 12
+# Exit codes of the Fast Downward driver (see scorpion/driver/returncodes.py).
+EXIT_REASONS = {
+    EXIT_SUCCESS: "finished",
+    1: "plan found, then out of memory",
+    2: "plan found, then out of time",
+    3: "plan found, then out of memory and time",
+    10: "unsolvable in translator",
+    11: "unsolvable",
+    EXIT_SEARCH_UNSOLVED_INCOMPLETE: "search space exhausted",
+    20: "translator out of memory",
+    21: "translator out of time",
+    22: "out of memory",
+    23: "out of time",
+    24: "out of memory and time",
+    30: "translator error",
+    31: "translator input error",
+    32: "search error",
+    33: "search input error",
+    34: "unsupported by search",
+    35: "driver error",
+    36: "driver input error",
+    37: "unsupported by driver",
+}
 
 
 class Response(object):
     def __init__(self, plan, cost, is_shortest, is_longest):
         """
         Use plan containing "a NO" together with cost=float('inf') and is_shortest=True for proven unsolvability.
+        The plan is either the text of the answer or the Path of a file that contains the complete answer.
+        Decoded plans are written to such files, so we never hold long plans in memory.
         """
         self.plan = plan
         self.cost = cost
         self.is_shortest = is_shortest
         self.is_longest = is_longest
 
+    def write(self, stream):
+        if isinstance(self.plan, Path):
+            with open(self.plan) as f:
+                shutil.copyfileobj(f, stream)
+        else:
+            stream.write(self.plan + "\n")
+
+    def discard(self):
+        # Called once the response is no longer needed.
+        if isinstance(self.plan, Path):
+            try:
+                self.plan.unlink()
+            except FileNotFoundError:
+                pass
+
     def __str__(self):
+        if isinstance(self.plan, Path):
+            return self.plan.read_text().rstrip("\n")
         return self.plan
 
 def generate_unsolvable_response(dat_filename: Path):
@@ -78,57 +129,686 @@ def is_best_response(response, track):
         return response.cost < float("inf")
 
 
-TIME_BUFFER_FOR_RESPONSE = 55
+class RunStatistics(object):
+    """
+    Timings and memory usage of a run, e.g., for benchmarks (see run.py
+    --stats). Times are in seconds since the statistics were created and
+    the peak memory of a component is the sum of the peak resident set sizes
+    of its processes, sampled while they run. best_response_proven tells
+    whether the best response is known to be optimal for the track.
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_plan_time = None
+        self.best_plan_time = None
+        self.best_plan_cost = None
+        self.best_response_proven = False
+        self.components = {}
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        return round(time.monotonic() - self.started, 3)
+
+    def plan_found(self, cost):
+        with self.lock:
+            if self.first_plan_time is None:
+                self.first_plan_time = self.elapsed()
+            self.best_plan_time = self.elapsed()
+            self.best_plan_cost = cost
+
+    def set_best_response_proven(self, proven):
+        with self.lock:
+            self.best_response_proven = proven
+
+    def component_started(self, process):
+        with self.lock:
+            self.components[process.run_dir] = {
+                "component": type(process.command).__name__,
+                "started": self.elapsed(),
+                "finished": None,
+                "exit_code": None,
+                "peak_rss_kb": 0,
+            }
+
+    def sample_memory(self, process):
+        peak_rss = get_peak_rss(process)
+        with self.lock:
+            entry = self.components.get(process.run_dir)
+            if entry is not None:
+                entry["peak_rss_kb"] = max(entry["peak_rss_kb"], peak_rss)
+
+    def component_finished(self, process):
+        with self.lock:
+            entry = self.components.get(process.run_dir)
+            if entry is not None:
+                entry["finished"] = self.elapsed()
+                entry["exit_code"] = process.returncode
+                entry["progress"] = dict(process.progress)
+
+    def get_peak_rss(self, process):
+        with self.lock:
+            entry = self.components.get(process.run_dir)
+            return entry["peak_rss_kb"] if entry is not None else 0
+
+    def to_json(self):
+        with self.lock:
+            return {
+                "total_time": self.elapsed(),
+                "first_plan_time": self.first_plan_time,
+                "best_plan_time": self.best_plan_time,
+                "best_plan_cost": self.best_plan_cost,
+                "best_response_proven": self.best_response_proven,
+                "components": list(self.components.values()),
+            }
+
+
+def get_peak_rss(process):
+    """
+    Return the sum of the peak resident set sizes (VmHWM) of a process and
+    its descendants in KB.
+    """
+    try:
+        tree = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    total = 0
+    for p in tree:
+        try:
+            with open(f"/proc/{p.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            pass
+    return total
+
+
+def get_rss(process):
+    """
+    Return the current resident set size of a process and its descendants in KB.
+    """
+    try:
+        tree = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    total = 0
+    for p in tree:
+        try:
+            total += p.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total // 1024
+
+
+def get_termination_reason(process):
+    code = process.returncode
+    if code is None:
+        return "running"
+    if process.termination_requested and code < 0:
+        return "terminated by driver"
+    if code < 0:
+        return f"killed by {signal.Signals(-code).name}"
+    return EXIT_REASONS.get(code, f"exit code {code}")
+
+
+def component_started(collector, process):
+    collector.stats.component_started(process)
+    name = type(process.command).__name__
+    collector.tracer.begin(name, process.run_dir, label=f"{Path(process.run_dir).name} ({name})", pid=process.pid)
+
+
+def component_finished(collector, process):
+    collector.stats.component_finished(process)
+    collector.tracer.end(
+        process.run_dir, exit_code=process.returncode, reason=get_termination_reason(process),
+        peak_rss_kb=collector.stats.get_peak_rss(process))
+
+
+def sample_memory(collector, process):
+    collector.stats.sample_memory(process)
+    if collector.tracer.enabled:
+        collector.tracer.counter("rss_kb", process.run_dir, rss_kb=get_rss(process))
+
+
+class ResponseCollector(object):
+    """
+    Keep the best response found so far. Responses are fully decoded when they
+    are added, so the current best one can be printed at any point in time,
+    e.g., from the deadline timer in run.py.
+    """
+    def __init__(self, track, tracer=NULL_TRACER):
+        self.track = track
+        self.best_response = None
+        self.lower_bound = 0
+        self.stats = RunStatistics()
+        self.tracer = tracer
+        self.lock = threading.Lock()
+
+    def set_lower_bound(self, lower_bound):
+        """
+        Plans with this number of jumps are known to be shortest. Return True
+        if the best response cannot be improved any further.
+        """
+        with self.lock:
+            self.lower_bound = max(self.lower_bound, lower_bound)
+            if self.best_response is not None and self.best_response.cost <= self.lower_bound:
+                self.best_response.is_shortest = True
+            is_best = is_best_response(self.best_response, self.track)
+            self.stats.set_best_response_proven(is_best)
+            return is_best
+
+    def get_upper_bound(self):
+        """
+        Return the number of jumps of the best plan found so far, or None.
+        """
+        with self.lock:
+            if self.best_response is None or self.best_response.cost == float("inf"):
+                return None
+            return self.best_response.cost
+
+    def add(self, response):
+        """
+        Return True if the best response cannot be improved any further.
+        """
+        with self.lock:
+            if response is not None and response.cost <= self.lower_bound:
+                response.is_shortest = True
+            previous_response = self.best_response
+            self.best_response = better_response(self.best_response, response, self.track)
+            for r in [previous_response, response]:
+                if r is not None and r is not self.best_response:
+                    r.discard()
+            if response is not None and self.best_response is response and response.cost < float("inf"):
+                self.stats.plan_found(response.cost)
+            is_best = is_best_response(self.best_response, self.track)
+            self.stats.set_best_response_proven(is_best)
+            if response is not None:
+                self.tracer.instant(
+                    "better_response", cost=response.cost,
+                    previous_cost=previous_response.cost if previous_response is not None else None,
+                    accepted=self.best_response is response, is_best=is_best)
+            return is_best
+
+    def is_improvement(self, response):
+        """
+        Check if the response would replace the current best one. Only the
+        cost and the flags of the response are considered, so this can be
+        used to avoid decoding plans that would be discarded anyway.
+        """
+        with self.lock:
+            if response.cost <= self.lower_bound:
+                response.is_shortest = True
+            return better_response(self.best_response, response, self.track) is not self.best_response
+
+    def get(self):
+        with self.lock:
+            return self.best_response
+
+    def write(self, stream):
+        # Hold the lock while writing, so the best response is not discarded in the meantime.
+        with self.lock:
+            if self.best_response is not None:
+                self.best_response.write(stream)
+            else:
+                stream.write("c UNKNOWN\n")
+
+
+# Responses are decoded as soon as they are found, so we only need to reserve
+# enough time to write out the best one when the deadline is reached.
+TIME_BUFFER_FOR_RESPONSE = 2
 TIME_BUFFER_FOR_SOLVERS = 4
 TIME_BUFFER_FOR_TERMINATE = 1
 MEMORY_BUFFER_FOR_DRIVER = 200 * 1024 * 1024
+# Helper processes of a component (e.g., the fast-downward.py wrapper) may
+# grow by this much, the rest of its share goes to its largest process.
+MEMORY_POOL_SLACK = 32 * 1024 * 1024
+MEMORY_POOL_INTERVAL = 0.2
+# Components that share a CPU take turns in slices of this many seconds.
+TIME_SLICE = 1.0
+# Racing portfolios only add a seeded copy of a component if every
+# component still gets at least this much memory.
+MIN_RACING_MEMORY = 1024 * 1024 * 1024
+# Racing copies leave multi-threaded components (e.g., the parallel MIP
+# checker) at least this many CPUs and this share of the CPUs not used by
+# the single-threaded components.
+MIN_MULTI_THREADED_CPUS = 2
+MULTI_THREADED_CPU_SHARE = 0.5
+PLAN_WATCHER_INTERVAL = 0.5
+# Components that support it read the cost of the best known plan from this
+# file in their run directory and only look for cheaper plans.
+BOUND_FILENAME = "bound"
+# Scorpion and SymK append progress records (one JSON object per line) to the
+# file named by this environment variable.
+PROGRESS_ENV_VARIABLE = "PLANNER_PROGRESS_FILE"
+PROGRESS_FILENAME = "progress.jsonl"
+# The MIP checker starts from the colouring in this file next to the compiled
+# task, if there is one, and writes every refined colouring to it.
+COLORING_FILENAME = "coloring"
+
+
+def get_racing_copies(components, num_cpus, memory_limit):
+    """
+    Return copies of the components with randomised variants, with
+    different random seeds, for the CPUs not needed by the components
+    themselves. Multi-threaded components keep a share of the CPUs (see
+    MULTI_THREADED_CPU_SHARE), since assign_cpus gives them whatever the
+    single-threaded components leave. The copies cycle through the
+    components that support it.
+    """
+    racers = [c for c in components if c.with_random_seed(0) is not None]
+    if not racers:
+        return []
+    num_single_threaded = sum(1 for c in components if not c.multi_threaded)
+    spare_cpus = num_cpus - num_single_threaded
+    if num_single_threaded < len(components):
+        reserved_cpus = max(MIN_MULTI_THREADED_CPUS, math.ceil(spare_cpus * MULTI_THREADED_CPU_SHARE))
+    else:
+        reserved_cpus = 0
+    max_components = (memory_limit - MEMORY_BUFFER_FOR_DRIVER) // MIN_RACING_MEMORY
+    num_copies = max(0, min(spare_cpus - reserved_cpus,
+                            max_components - len(components)))
+    return [racers[i % len(racers)].with_random_seed(i + 1) for i in range(num_copies)]
 
 
 class PortfolioConfig(object):
 
-    def __init__(self, track, components):
+    def __init__(self, track, components, elastic_memory=True, race=False):
         self.track = track
         self.components = components
+        self.elastic_memory = elastic_memory
+        # Start seeded copies of randomised components on idle CPUs. The
+        # collector keeps the first and the best plan of all of them.
+        self.race = race
 
-    def run(self, run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename):
+    def run(self, run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename, collector, graph):
         """
         Run components in parallel, react to one of them finishing, decide wether to keep the others running.
+        All responses are reported to the collector, which also holds the final result.
+        The parsed graph is used to validate the plans.
         """
-        component_memory_limit = (memory_limit - MEMORY_BUFFER_FOR_DRIVER) // len(self.components)
+        available_cpus = sorted(os.sched_getaffinity(0))
+        components = list(self.components)
+        if self.race:
+            components += get_racing_copies(components, len(available_cpus), memory_limit)
+        component_memory_limit = (memory_limit - MEMORY_BUFFER_FOR_DRIVER) // len(components)
         component_time_limit = time_limit - TIME_BUFFER_FOR_RESPONSE - TIME_BUFFER_FOR_SOLVERS - TIME_BUFFER_FOR_TERMINATE
 
-        best_response = None
+        cpus = assign_cpus(components, available_cpus)
         processes = []
-        for i, c in enumerate(self.components):
+        for i, c in enumerate(components):
             component_run_dir_path = Path(run_dir) / f"component_{i}"
             component_run_dir_path.mkdir()
-            process = c.start(
-                str(component_run_dir_path), component_memory_limit, component_time_limit,
-                col_filename, dat_filename, sas_filename)
+            with collector.tracer.span("start component", component=type(c).__name__):
+                process = c.start(
+                    str(component_run_dir_path), component_memory_limit, component_time_limit,
+                    col_filename, dat_filename, sas_filename, graph, cpus[i])
+            component_started(collector, process)
             processes.append(process)
+        slicer = TimeSlicer(processes, cpus)
+        slicer.start()
+
+        def on_best_response():
+            # Called from the watcher thread. We only send the signals here and
+            # leave waiting for the processes to the main thread.
+            request_termination(processes)
 
         def on_process_terminate(process):
+            read_progress(process)
+            component_finished(collector, process)
+            # Hand the CPUs of the component to the remaining ones.
+            slicer.release_cpus(process)
+            try:
+                lower_bound = process.command.read_lower_bound(process)
+                if lower_bound is not None and collector.set_lower_bound(lower_bound):
+                    terminate_all(processes)
+            except:
+                pass
             try:
-                new_response = process.command.parse_reponse(process, self.track)
+                with collector.tracer.span("parse response", process.run_dir):
+                    new_response = process.command.parse_reponse(process, self.track)
             except:
                 # Silently ignore errors in the parsers so they don't kill the other components.
                 # We also do not want to print anything because we should only print the solution.
                 new_response = None
-            nonlocal best_response
-            best_response = better_response(best_response, new_response, self.track)
-            if is_best_response(best_response, self.track):
+            if collector.add(new_response):
                 terminate_all(processes)
 
+        watcher = PlanWatcher(processes, self.track, graph, dat_filename, collector, on_best_response)
+        watcher.start()
+        if self.elastic_memory:
+            pool = MemoryPool(processes, memory_limit - MEMORY_BUFFER_FOR_DRIVER)
+            pool.start()
         psutil.wait_procs(processes, timeout=time_limit - TIME_BUFFER_FOR_RESPONSE, callback=on_process_terminate)
-        return best_response
+        if self.elastic_memory:
+            pool.stop()
+        slicer.stop()
+        watcher.stop()
+        return collector.get()
 
 
-def terminate_all(processes):
+class PlanWatcher(threading.Thread):
+    """
+    Poll the run directories of running components for new plan files, so
+    anytime plans are decoded as soon as they are written and not only once
+    the component terminates.
+    """
+    def __init__(self, processes, track, graph, dat_filename, collector, on_best_response=None,
+                 interval=PLAN_WATCHER_INTERVAL):
+        super().__init__(daemon=True)
+        self.processes = processes
+        self.track = track
+        self.graph = graph
+        self.instance, self.init, self.goal = read_instance(Path(dat_filename))
+        self.collector = collector
+        self.on_best_response = on_best_response
+        self.interval = interval
+        self.seen_plan_files = set()
+        self.published_upper_bound = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for process in self.processes:
+                self.poll(process)
+                self.poll_progress(process)
+                self.poll_lower_bound(process)
+                sample_memory(self.collector, process)
+            self.publish_upper_bound()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def poll(self, process):
+        for plan_file in natsorted(Path(process.run_dir).glob("sas_plan*")):
+            if plan_file in self.seen_plan_files:
+                continue
+            try:
+                cost = read_plan_cost(plan_file)
+                if cost is None:
+                    # The planner is still writing this file, look at it again later.
+                    continue
+                self.seen_plan_files.add(plan_file)
+                self.collector.tracer.instant("plan found", process.run_dir, cost=cost, plan_file=plan_file.name)
+                new_response = process.command.plan_response(process, None, cost, self.track)
+                if not self.collector.is_improvement(new_response):
+                    continue
+                with self.collector.tracer.span("decode plan", process.run_dir, plan_file=plan_file.name):
+                    new_response.plan, cost = decode_plan_file(
+                        plan_file, self.graph, self.instance, self.init, self.goal)
+                if new_response.plan is None:
+                    continue
+            except:
+                # Same as for the parsers: never let a broken plan file kill the driver.
+                self.seen_plan_files.add(plan_file)
+                continue
+            if self.collector.add(new_response) and self.on_best_response is not None:
+                self.on_best_response()
+
+    def poll_progress(self, process):
+        try:
+            records = read_progress(process)
+        except OSError:
+            return
+        if self.collector.tracer.enabled:
+            for record in records:
+                for key, value in record.items():
+                    if key != "time" and isinstance(value, (int, float)):
+                        self.collector.tracer.counter(key, process.run_dir, **{key: value})
+
+    def poll_lower_bound(self, process):
+        try:
+            lower_bound = process.command.read_lower_bound(process)
+        except:
+            return
+        if lower_bound is None:
+            return
+        if self.collector.set_lower_bound(lower_bound) and self.on_best_response is not None:
+            self.on_best_response()
+
+    def publish_upper_bound(self):
+        if self.track != SHORTEST_TRACK:
+            # Only plans cheaper than the best one are interesting.
+            return
+        upper_bound = self.collector.get_upper_bound()
+        if upper_bound is None or upper_bound == self.published_upper_bound:
+            return
+        self.published_upper_bound = upper_bound
+        for process in self.processes:
+            try:
+                write_bound_file(Path(process.run_dir), upper_bound)
+            except OSError:
+                pass
+
+
+def write_bound_file(run_dir: Path, jumps):
+    # Every jump consists of a pick and a place action. Replace the file
+    # atomically, so the planner never reads a partially written bound.
+    tmp_file = run_dir / f".{BOUND_FILENAME}.tmp"
+    tmp_file.write_text(f"{2 * jumps}\n")
+    os.replace(tmp_file, run_dir / BOUND_FILENAME)
+
+
+class MemoryPool(threading.Thread):
+    """
+    Share a memory limit between the components instead of splitting it
+    statically. Components start with an equal share as RLIMIT_AS. The pool
+    then periodically measures the address space of every running component
+    (including its child processes) and divides the unused part of the limit
+    equally among them by raising or lowering their RLIMIT_AS. Memory of
+    components that finished or need little memory thus becomes available
+    to the others.
+
+    Within a component, the largest process gets the share and its helper
+    processes only MEMORY_POOL_SLACK. The processes of multi-threaded
+    components are workers that each build their own models, so they split
+    the share equally instead.
+    """
+    def __init__(self, processes, memory_limit, interval=MEMORY_POOL_INTERVAL):
+        super().__init__(daemon=True)
+        self.processes = processes
+        self.memory_limit = memory_limit
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.rebalance()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def rebalance(self):
+        components = []
+        for process in self.processes:
+            usage = get_memory_usage(process)
+            if usage:
+                components.append((process, usage))
+        if not components:
+            return
+        used = sum(vms for _, usage in components for _, vms in usage)
+        share = max(self.memory_limit - used, 0) // len(components)
+        for process, usage in components:
+            usage.sort(key=lambda entry: entry[1], reverse=True)
+            if process.command.multi_threaded:
+                slack = share // len(usage)
+            else:
+                slack = min(MEMORY_POOL_SLACK, share // len(usage))
+            headroom = share - slack * (len(usage) - 1)
+            for p, vms in usage:
+                set_memory_limit(p, vms + headroom)
+                headroom = slack
+
+
+def get_memory_usage(process):
+    """
+    Return a list of (process, virtual memory size) pairs for a component
+    and all its descendants, or an empty list if it is no longer running.
+    """
+    if not is_running(process):
+        return []
+    try:
+        tree = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+    usage = []
+    for p in tree:
+        try:
+            usage.append((p, p.memory_info().vms))
+        except psutil.NoSuchProcess:
+            pass
+    return usage
+
+
+def set_memory_limit(process, limit):
+    try:
+        _, hard_limit = process.rlimit(resource.RLIMIT_AS)
+        if hard_limit != resource.RLIM_INFINITY:
+            limit = min(limit, hard_limit)
+        process.rlimit(resource.RLIMIT_AS, (limit, hard_limit))
+    except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError):
+        pass
+
+
+def assign_cpus(components, cpus):
+    """
+    Return the set of CPUs each component is pinned to. Single-threaded
+    components get a CPU of their own, multi-threaded ones share the
+    remaining CPUs. With fewer CPUs than components, the components are
+    distributed round-robin and components on the same CPU take turns
+    (see TimeSlicer).
+    """
+    if len(cpus) < len(components):
+        return [{cpus[i % len(cpus)]} for i in range(len(components))]
+    remaining = list(cpus)
+    assignment = []
+    for c in components:
+        if c.multi_threaded:
+            assignment.append(None)
+        else:
+            assignment.append({remaining.pop(0)})
+    return [cpu_set or set(remaining) for cpu_set in assignment]
+
+
+class TimeSlicer(threading.Thread):
+    """
+    Let components pinned to the same CPU take turns: only one of them runs
+    at a time, the others are stopped with SIGSTOP and continued with
+    SIGCONT after every TIME_SLICE seconds, in a fixed order. This keeps
+    searches from evicting each other's caches and makes runs with fewer
+    CPUs than components reproducible. Each component still has its own
+    CPU time limit (RLIMIT_CPU), which only counts the time it runs.
+
+    When a component finishes, its CPUs go to a component that takes turns
+    with others or, if there is none, to the multi-threaded components.
+    """
+    def __init__(self, processes, cpus, time_slice=TIME_SLICE):
+        super().__init__(daemon=True)
+        self.queues = {}
+        for process, cpu_set in zip(processes, cpus):
+            self.queues.setdefault(frozenset(cpu_set), []).append(process)
+        self.time_slice = time_slice
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        for queue in self.queues.values():
+            for process in queue[1:]:
+                signal_process_tree(process, signal.SIGSTOP)
+
+    def run(self):
+        while not self.stopped.wait(self.time_slice):
+            with self.lock:
+                for queue in self.queues.values():
+                    self.rotate(queue)
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        with self.lock:
+            for queue in self.queues.values():
+                for process in queue:
+                    signal_process_tree(process, signal.SIGCONT)
+
+    def rotate(self, queue):
+        queue[:] = [process for process in queue if is_running(process)]
+        if len(queue) > 1:
+            signal_process_tree(queue[0], signal.SIGSTOP)
+            queue.append(queue.pop(0))
+            signal_process_tree(queue[0], signal.SIGCONT)
+
+    def release_cpus(self, process):
+        with self.lock:
+            cpu_set = None
+            for key, queue in self.queues.items():
+                if process in queue:
+                    cpu_set = key
+                    queue.remove(process)
+            if cpu_set is None or self.queues[cpu_set]:
+                # Unknown component, or others still take turns on these CPUs.
+                return
+            del self.queues[cpu_set]
+            shared_queues = [queue for queue in self.queues.values() if len(queue) > 1]
+            if shared_queues:
+                # The last component of a queue is stopped, so move it.
+                moved = max(shared_queues, key=len).pop()
+                set_cpu_affinity(moved, cpu_set)
+                signal_process_tree(moved, signal.SIGCONT)
+                self.queues[cpu_set] = [moved]
+                return
+            for key, queue in list(self.queues.items()):
+                if any(p.command.multi_threaded for p in queue):
+                    for p in queue:
+                        set_cpu_affinity(p, key | cpu_set)
+                    self.queues[key | cpu_set] = self.queues.pop(key)
+                    return
+
+
+def set_cpu_affinity(process, cpus):
+    try:
+        tree = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return
+    for p in tree:
+        try:
+            p.cpu_affinity(sorted(cpus))
+        except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError):
+            pass
+
+
+def is_running(process):
+    try:
+        return process.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def signal_process_tree(process, sig):
+    try:
+        tree = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return
+    for p in tree:
+        try:
+            p.send_signal(sig)
+        except psutil.NoSuchProcess:
+            pass
+
+
+def request_termination(processes):
     for p in processes:
+        p.termination_requested = True
         try:
             p.terminate()
         except psutil.NoSuchProcess:
             pass
+        # Stopped components only handle the signal once they continue.
+        signal_process_tree(p, signal.SIGCONT)
+
+
+def terminate_all(processes):
+    request_termination(processes)
     psutil.wait_procs(processes, timeout=TIME_BUFFER_FOR_TERMINATE)
     for p in processes:
         try:
@@ -142,20 +822,44 @@ class SingleConfig(object):
         self.track = track
         self.component = component
 
-    def run(self, run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename):
+    def run(self, run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename, collector, graph):
         component_memory_limit = memory_limit - MEMORY_BUFFER_FOR_DRIVER
         component_time_limit = time_limit - TIME_BUFFER_FOR_RESPONSE - TIME_BUFFER_FOR_SOLVERS
-        process = self.component.start(run_dir, component_memory_limit, component_time_limit, col_filename, dat_filename, sas_filename)
+        with collector.tracer.span("start component", component=type(self.component).__name__):
+            process = self.component.start(run_dir, component_memory_limit, component_time_limit, col_filename, dat_filename, sas_filename, graph)
+        component_started(collector, process)
+        # Also harvest anytime plans, so the deadline timer has something to print.
+        watcher = PlanWatcher([process], self.track, graph, dat_filename, collector)
+        watcher.start()
         process.wait()
-        return self.component.parse_reponse(process, self.track)
+        read_progress(process)
+        component_finished(collector, process)
+        watcher.stop()
+        with collector.tracer.span("parse response", process.run_dir):
+            response = self.component.parse_reponse(process, self.track)
+        collector.add(response)
+        return collector.get()
 
 
 class PlannerCommand(object):
+    # Multi-threaded components share the CPUs not used by the others.
+    multi_threaded = False
+
     def __init__(self, cmd):
         self.cmd = cmd
 
-    def start(self, run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename):
+    def with_random_seed(self, random_seed):
+        """
+        Return a copy of the component that breaks ties with the given
+        random seed, or None if the component is deterministic.
+        """
+        return None
+
+    def start(self, run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename, graph, cpus=None):
         def prepare_call():
+            if cpus:
+                # Inherited by all processes the component starts.
+                os.sched_setaffinity(0, cpus)
             resource.setrlimit(resource.RLIMIT_CPU, (time_limit-1, time_limit))
             _, hard_mem_limit = resource.getrlimit(resource.RLIMIT_AS)
             resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard_mem_limit))
@@ -163,6 +867,7 @@ class PlannerCommand(object):
         # Replace placeholders (limits, inputs) in cmd.
         cmd = [part.format(
             run_dir=run_dir,
+            task_dir=Path(sas_filename).parent,
             memory_limit=memory_limit,
             time_limit=time_limit,
             col_filename=col_filename,
@@ -172,7 +877,8 @@ class PlannerCommand(object):
         # Start the planner.
         out_file = open(f"{run_dir}/run.log", "w")
         err_file = open(f"{run_dir}/run.err", "w")
-        process = psutil.Popen(cmd, cwd=run_dir, stdout=out_file, stderr=err_file, preexec_fn=prepare_call)
+        env = dict(os.environ, **{PROGRESS_ENV_VARIABLE: str(Path(run_dir) / PROGRESS_FILENAME)})
+        process = psutil.Popen(cmd, cwd=run_dir, stdout=out_file, stderr=err_file, preexec_fn=prepare_call, env=env)
         # Store information potentially needed by the parser.
         process.command = self
         process.run_dir = run_dir
@@ -181,50 +887,184 @@ class PlannerCommand(object):
         process.col_filename = col_filename
         process.dat_filename = dat_filename
         process.sas_filename = sas_filename
+        process.graph = graph
+        process.log_offset = 0
+        process.phase_bound = None
+        process.termination_requested = False
+        process.progress_offset = 0
+        process.progress = {}
+        # Both the plan watcher and the main thread read the log and the
+        # progress file, and each record must be handled exactly once.
+        process.reader_lock = threading.RLock()
         return process
 
     def parse_reponse(self, process, track):
         # implement in derived classes: parse any plans, select the best one and return a response
         return None
 
+    def read_lower_bound(self, process):
+        # Number of jumps every plan needs according to the running component.
+        # Overwrite in derived classes if the component reports such bounds.
+        return None
+
+    def plan_response(self, process, plan, cost, track):
+        # Response for a plan found while the component is still running.
+        # Overwrite in derived classes if such a plan is known to be optimal.
+        return Response(plan, cost, is_shortest=False, is_longest=False)
+
 
 def generate_unsolvable_response(dat_filename: Path):
     plan_lines = dat_filename.read_text() + "\na NO"
     return Response(plan_lines, float("inf"), is_shortest=True, is_longest=True)
 
-def parse_valid_plan_with_highest_id(run_dir: Path, dat_filename: Path):
+def read_instance(dat_filename: Path):
     instance = dat_filename.read_text()
     instance_lines = instance.splitlines()
     assert "s " == instance_lines[0][0:2]
     assert "t " == instance_lines[1][0:2]
-    init = set(instance_lines[0][2:].split())
-    goal = set(instance_lines[1][2:].split())
+    init = set(to_var_id(x) for x in instance_lines[0][2:].split())
+    goal = set(to_var_id(x) for x in instance_lines[1][2:].split())
+    return instance, init, goal
+
+
+COST_LINE_PATTERN = re.compile(r"; cost = (\d+) \(unit cost\)")
+
+def read_plan_cost(plan_file: Path):
+    """
+    Return the number of jumps of a plan file, or None if the file is not
+    completely written yet. The planners write the cost line last.
+    """
+    with open(plan_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 100, 0))
+        lines = f.read().decode().splitlines()
+    match = COST_LINE_PATTERN.match(lines[-1]) if lines else None
+    if match is None:
+        return None
+    # Every jump consists of a pick and a place action.
+    return int(match.group(1)) // 2
+
+
+def decode_plan_file(plan_file: Path, graph, instance, init, goal):
+    """
+    Write the decoded answer to a new file in the same directory, validating
+    the plan in the same pass as it is streamed from its file. Return the
+    Path of the answer and the number of jumps, or (None, None) for invalid
+    plans.
+    """
+    if read_plan_cost(plan_file) is None or len(init) != len(goal):
+        return None, None
+    fd, answer_filename = tempfile.mkstemp(prefix="answer_", dir=plan_file.parent)
+    with open(plan_file, "rb") as f, os.fdopen(fd, "w") as out:
+        out.write(instance)
+        try:
+            cost = write_answer(out, init, read_moves(f), graph, goal)
+        except ValueError:
+            cost = None
+    if cost is None:
+        os.unlink(answer_filename)
+        return None, None
+    return Path(answer_filename), cost
 
+
+def parse_valid_plan_with_highest_id(run_dir: Path, graph, dat_filename: Path):
+    instance, init, goal = read_instance(dat_filename)
     for plan_file in natsorted(run_dir.glob("sas_plan*"), reverse=True):
-        lines = plan_file.read_text().splitlines()
-        if not lines:
-            continue
-        *actions, cost_line = lines
-        match = re.match(r"; cost = (\d+) \(unit cost\)", cost_line)
-        if not match:
-            continue
-        plan, cost = decode_plan(actions, init, goal)
+        plan, cost = decode_plan_file(plan_file, graph, instance, init, goal)
         if plan is not None:
-            return instance + plan, cost
+            return plan, cost
     return None, None
 
 
+def read_new_log_lines(process):
+    """
+    Return the complete lines added to the log of the process since the last
+    call. The log is read incrementally from process.log_offset.
+    """
+    with process.reader_lock:
+        with open(Path(process.run_dir) / "run.log", "rb") as f:
+            f.seek(process.log_offset)
+            data = f.read()
+        # Only consider complete lines, the rest is read again next time.
+        end = data.rfind(b"\n") + 1
+        process.log_offset += end
+    return data[:end].decode(errors="replace").splitlines()
+
+
+def read_progress(process):
+    """
+    Return the progress records the component wrote since the last call.
+    process.progress holds the latest value of every field.
+    """
+    with process.reader_lock:
+        try:
+            with open(Path(process.run_dir) / PROGRESS_FILENAME, "rb") as f:
+                f.seek(process.progress_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        end = data.rfind(b"\n") + 1
+        process.progress_offset += end
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+            process.progress.update(records[-1])
+    return records
+
+
+PHASE_BOUND_PATTERN = re.compile(r"Cost bound of this phase: (\d+)")
+PHASE_START_LINE = "Starting search: "
+EXTERNAL_BOUND_LINE = "Use external bound: "
+EXHAUSTED_LINE = "Completely explored state space -- no solution!"
+
+def scan_scorpion_log(lines, phase_bound=None):
+    """
+    A phase of the iterated search that exhausts its state space proves
+    that there is no plan cheaper than the bound of the phase. The search
+    only logs the bound for phases that reopen closed nodes, the others
+    prove nothing. Return the highest such lower bound in jumps (or None)
+    and the bound of the current phase.
+    """
+    lower_bound = None
+    for line in lines:
+        match = PHASE_BOUND_PATTERN.search(line)
+        if match:
+            phase_bound = int(match.group(1))
+        elif PHASE_START_LINE in line:
+            phase_bound = None
+        elif EXHAUSTED_LINE in line and phase_bound is not None:
+            # Every jump consists of two actions.
+            lower_bound = max(lower_bound or 0, (phase_bound + 1) // 2)
+    return lower_bound, phase_bound
+
+
+def read_scorpion_lower_bound(process):
+    # The phase bound carries over to the lines of the next call.
+    with process.reader_lock:
+        lower_bound, process.phase_bound = scan_scorpion_log(
+            read_new_log_lines(process), process.phase_bound)
+    return lower_bound
+
+
 def parse_scorpion_response(process, track):
-    if process.returncode == EXIT_SEARCH_UNSOLVED_INCOMPLETE:
+    with open(f"{process.run_dir}/run.log") as f:
+        lines = f.read().splitlines()
+    lower_bound, _ = scan_scorpion_log(lines)
+
+    # A search that only looks for plans cheaper than a bound read from
+    # the bound file fails if the bound is already optimal.
+    if (process.returncode == EXIT_SEARCH_UNSOLVED_INCOMPLETE
+            and not any(EXTERNAL_BOUND_LINE in line for line in lines)):
         return generate_unsolvable_response(Path(process.dat_filename))
 
-    best_plan, cost = parse_valid_plan_with_highest_id(Path(process.run_dir), Path(process.dat_filename))
+    best_plan, cost = parse_valid_plan_with_highest_id(Path(process.run_dir), process.graph, Path(process.dat_filename))
     if best_plan is None:
         return None
-
-    with open(f"{process.run_dir}/run.log") as f:
-        exhausted_state_space = any("Completely explored state space -- no solution!" in line for line in f)
-    return Response(best_plan, cost, is_shortest=exhausted_state_space, is_longest=False)
+    is_shortest = lower_bound is not None and cost <= lower_bound
+    return Response(best_plan, cost, is_shortest=is_shortest, is_longest=False)
 
 
 def parse_symk_response(process, track):
@@ -235,11 +1075,11 @@ def parse_symk_response(process, track):
     if process.returncode == EXIT_SEARCH_UNSOLVED_INCOMPLETE:
         return generate_unsolvable_response(Path(process.dat_filename))
     elif track == SHORTEST_TRACK or track == EXISTENT_TRACK:
-        best_plan, cost = parse_valid_plan_with_highest_id(Path(process.run_dir), Path(process.dat_filename))
+        best_plan, cost = parse_valid_plan_with_highest_id(Path(process.run_dir), process.graph, Path(process.dat_filename))
         if best_plan is not None:
             shortest_plan = True
     else:
-        best_plan, cost = parse_valid_plan_with_highest_id(Path(process.run_dir), Path(process.dat_filename))
+        best_plan, cost = parse_valid_plan_with_highest_id(Path(process.run_dir), process.graph, Path(process.dat_filename))
         if best_plan is not None:
             shortest_plan = False
 
@@ -251,32 +1091,89 @@ def parse_symk_response(process, track):
     return None
 
 
+BOUND_LINE_PATTERN = re.compile(r"BOUND: (\d+) < ")
+
+def read_symk_lower_bound(process):
+    """
+    Return the highest lower bound logged by SymK since the last call, in
+    jumps, or None.
+    """
+    bounds = [int(m.group(1)) for m in map(BOUND_LINE_PATTERN.search, read_new_log_lines(process)) if m]
+    if not bounds:
+        return None
+    # SymK reports bounds in actions, every jump consists of two actions.
+    return (max(bounds) + 1) // 2
+
+
+def symk_plan_response(plan, cost, track):
+    shortest_plan = track == SHORTEST_TRACK or track == EXISTENT_TRACK
+    return Response(plan, cost, is_shortest=shortest_plan, is_longest=False)
+
+
+def scorpion_random_options(random_seed, tiebreaking=True, successors=True):
+    """
+    Return the options that randomise the tie-breaking of the open lists
+    and the order of the successors of a Scorpion search.
+    """
+    if random_seed is None:
+        return ""
+    options = []
+    if tiebreaking:
+        options.append("random_tiebreaking=true")
+    if successors:
+        options.append("randomize_successors=true")
+    options.append(f"random_seed={random_seed}")
+    return "," + ",".join(options)
+
+
 class ScorpionAnytime(PlannerCommand):
-    def __init__(self):
+    def __init__(self, random_seed=None):
+        self.random_seed = random_seed
+        open_list_options = scorpion_random_options(random_seed, successors=False)
+        # eager takes the tie-breaking from its open list.
+        eager_options = scorpion_random_options(random_seed, tiebreaking=False)
+        search_options = scorpion_random_options(random_seed)
         cmd = [SCORPION, "{sas_filename}",
                "--landmarks", "lmg=lm_hm(use_orders=false, m=1)",
                "--evaluator", "hlm=lmcount(lmg, admissible=True, pref=false)",
-               "--search", """iterated([
-                    eager(single(hlm)),
-                    eager_wastar([hlm],w=5),
-                    eager_wastar([hlm],w=3),
-                    eager_wastar([hlm],w=2),
-                    astar(hlm)
-                    ],repeat_last=false,continue_on_fail=false)"""]
+               "--search", f"""iterated([
+                    eager(single(hlm{open_list_options}){eager_options}),
+                    eager_wastar([hlm],w=5{search_options}),
+                    eager_wastar([hlm],w=3{search_options}),
+                    eager_wastar([hlm],w=2{search_options}),
+                    astar(hlm{search_options})
+                    ],repeat_last=false,continue_on_fail=false,bound_file={BOUND_FILENAME})"""]
         super().__init__(cmd)
 
+    def with_random_seed(self, random_seed):
+        return ScorpionAnytime(random_seed)
+
     def parse_reponse(self, process, track):
         return parse_scorpion_response(process, track)
 
+    def read_lower_bound(self, process):
+        lower_bound = read_scorpion_lower_bound(process)
+        # Only the A* phase reports f values, and its heuristic is admissible,
+        # so the highest f value expanded so far is a lower bound in actions.
+        if "f" in process.progress:
+            lower_bound = max(lower_bound or 0, (process.progress["f"] + 1) // 2)
+        return lower_bound
+
 
 class ScorpionFirstSolution(PlannerCommand):
-    def __init__(self):
+    def __init__(self, random_seed=None):
+        self.random_seed = random_seed
+        open_list_options = scorpion_random_options(random_seed, successors=False)
+        eager_options = scorpion_random_options(random_seed, tiebreaking=False)
         cmd = [SCORPION, "{sas_filename}",
                "--landmarks", "lmg=lm_hm(use_orders=false, m=1)",
                "--evaluator", "hlm=lmcount(lmg, admissible=True, pref=false)",
-               "--search", "eager(single(hlm))"]
+               "--search", f"eager(single(hlm{open_list_options}){eager_options})"]
         super().__init__(cmd)
 
+    def with_random_seed(self, random_seed):
+        return ScorpionFirstSolution(random_seed)
+
     def parse_reponse(self, process, track):
         return parse_scorpion_response(process, track)
 
@@ -289,6 +1186,15 @@ class SymKShortSolution(PlannerCommand):
     def parse_reponse(self, process, track):
         return parse_symk_response(process, track)
 
+    def read_lower_bound(self, process):
+        lower_bound = read_symk_lower_bound(process)
+        if "lower_bound" in process.progress:
+            lower_bound = max(lower_bound or 0, (process.progress["lower_bound"] + 1) // 2)
+        return lower_bound
+
+    def plan_response(self, process, plan, cost, track):
+        return symk_plan_response(plan, cost, track)
+
 
 class SymKLongSolution(PlannerCommand):
     def __init__(self):
@@ -299,10 +1205,16 @@ class SymKLongSolution(PlannerCommand):
     def parse_reponse(self, process, track):
         return parse_symk_response(process, track)
 
+    def plan_response(self, process, plan, cost, track):
+        return symk_plan_response(plan, cost, track)
+
 
 class MIPPlanner(PlannerCommand):
+    multi_threaded = True
+
     def __init__(self):
-        cmd = [MIP_SOLVER, "{col_filename}", "{dat_filename}"]
+        cmd = [MIP_SOLVER, "{col_filename}", "{dat_filename}", "--time-limit", "{time_limit}",
+               "--coloring", f"{{task_dir}}/{COLORING_FILENAME}"]
         super().__init__(cmd)
 
     def parse_reponse(self, process, track):
@@ -312,6 +1224,25 @@ class MIPPlanner(PlannerCommand):
             return None
 
 
+# Components by name, e.g., to build portfolios chosen by selection.py.
+COMPONENTS = {
+    "scorpion-anytime": ScorpionAnytime,
+    "scorpion-first-solution": ScorpionFirstSolution,
+    "symk-short": SymKShortSolution,
+    "symk-long": SymKLongSolution,
+    "mip": MIPPlanner,
+}
+
+
+def get_component_names(config):
+    if isinstance(config, PortfolioConfig):
+        components = config.components
+    else:
+        components = [config.component]
+    names = {cls: name for name, cls in COMPONENTS.items()}
+    return [names[type(c)] for c in components]
+
+
 CONFIGS = {
     "shortest-single": SingleConfig(SHORTEST_TRACK,
         ScorpionAnytime()
@@ -319,7 +1250,7 @@ CONFIGS = {
     "shortest-portfolio": PortfolioConfig(SHORTEST_TRACK, [
         ScorpionAnytime(),
         SymKShortSolution(),
-    ]),
+    ], race=True),
     "existent-single": SingleConfig(EXISTENT_TRACK,
         ScorpionFirstSolution()
     ),
@@ -327,7 +1258,7 @@ CONFIGS = {
         ScorpionFirstSolution(),
         SymKShortSolution(),
         MIPPlanner(),
-    ]),
+    ], race=True),
     "longest-single": SingleConfig(LONGEST_TRACK,
         SymKLongSolution()
     ),
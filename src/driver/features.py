@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""
+Cheap instance features for algorithm selection. All features are computed
+in time linear in the size of the graph.
+
+Usage: features.py COL_FILE DAT_FILE
+"""
+
+import json
+import math
+import sys
+
+from compile import parse_col_file, parse_dat_file
+
+FEATURE_NAMES = [
+    "num_nodes",
+    "num_edges",
+    "num_tokens",
+    "min_degree",
+    "max_degree",
+    "mean_degree",
+    "degree_stddev",
+    "density",
+    "symmetric_difference",
+    "independence_slack",
+]
+
+
+def count_free_nodes(graph, tokens):
+    # Nodes that could take an additional token.
+    blocked = set(tokens)
+    for v in tokens:
+        blocked.update(graph[v])
+    return graph.num_nodes - len(blocked)
+
+
+def compute_features(graph, start, target):
+    """
+    Return a dictionary with the features in FEATURE_NAMES. The independence
+    slack is the fraction of nodes that are neither occupied by nor adjacent
+    to a token, averaged over the start and target states. Instances with
+    little slack leave the tokens little room to move.
+    """
+    n = graph.num_nodes
+    offsets = graph.offsets
+    degrees = [offsets[v + 1] - offsets[v] for v in range(n)]
+    mean_degree = sum(degrees) / n if n else 0.0
+    variance = sum((d - mean_degree) ** 2 for d in degrees) / n if n else 0.0
+    free_nodes = count_free_nodes(graph, start) + count_free_nodes(graph, target)
+    return {
+        "num_nodes": n,
+        "num_edges": graph.num_edges,
+        "num_tokens": len(start),
+        "min_degree": min(degrees, default=0),
+        "max_degree": max(degrees, default=0),
+        "mean_degree": mean_degree,
+        "degree_stddev": math.sqrt(variance),
+        "density": 2 * graph.num_edges / (n * (n - 1)) if n > 1 else 0.0,
+        "symmetric_difference": len(start ^ target),
+        "independence_slack": free_nodes / (2 * n) if n else 0.0,
+    }
+
+
+def compute_instance_features(col_filename, dat_filename):
+    graph = parse_col_file(col_filename)
+    start, target = parse_dat_file(dat_filename)
+    return compute_features(graph, start, target)
+
+
+if __name__ == "__main__":
+    print(json.dumps(compute_instance_features(*sys.argv[1:]), indent=2))
@@ -0,0 +1,137 @@
+"""
+Recognize instances that only differ in the names of their nodes.
+
+Two instances are isomorphic if there is a bijection between their nodes
+that maps edges to edges, the start state to the start state and the
+target state to the target state. Plans of one instance then translate to
+plans of the other.
+
+instance_hash computes a hash that is invariant under isomorphism by
+colour refinement (1-dimensional Weisfeiler-Leman). Equal hashes do not
+guarantee isomorphism, so find_isomorphism looks for an explicit bijection
+within the colour classes of the refinement.
+"""
+
+import hashlib
+
+MAX_ISOMORPHISM_STEPS = 1000000
+
+
+def refine_colours(graph, start, target):
+    """
+    Return the stable colouring of the nodes and a list with the sorted
+    signatures of every round. Colours are numbered by the sorted order of
+    their signatures, so isomorphic instances get the same colours on
+    corresponding nodes.
+    """
+    colours = [(v in start) * 2 + (v in target) for v in graph]
+    rounds = [sorted(set(colours))]
+    num_colours = len(rounds[0])
+    while True:
+        signatures = [
+            (colours[v], tuple(sorted(colours[u] for u in graph[v])))
+            for v in graph]
+        distinct = sorted(set(signatures))
+        ids = {signature: i for i, signature in enumerate(distinct)}
+        colours = [ids[signature] for signature in signatures]
+        rounds.append(distinct)
+        if len(distinct) == num_colours:
+            return colours, rounds
+        num_colours = len(distinct)
+
+
+def instance_hash(graph, start, target):
+    colours, rounds = refine_colours(graph, start, target)
+    h = hashlib.sha256()
+    h.update(f"{graph.num_nodes} {graph.num_edges} {len(start)} {len(target)}".encode())
+    for distinct in rounds:
+        h.update(repr(distinct).encode())
+    # The signatures are sets, so also include how often each colour occurs.
+    counts = [0] * (max(colours, default=-1) + 1)
+    for colour in colours:
+        counts[colour] += 1
+    h.update(repr(counts).encode())
+    return h.hexdigest()
+
+
+def find_isomorphism(graph1, start1, target1, graph2, start2, target2, max_steps=MAX_ISOMORPHISM_STEPS):
+    """
+    Return a list that maps every node of the first instance to a node of
+    the second one, or None if the instances are not isomorphic or no
+    isomorphism was found within max_steps backtracking steps.
+    """
+    if (graph1.num_nodes, graph1.num_edges, len(start1), len(target1)) != \
+            (graph2.num_nodes, graph2.num_edges, len(start2), len(target2)):
+        return None
+    colours1, rounds1 = refine_colours(graph1, start1, target1)
+    colours2, rounds2 = refine_colours(graph2, start2, target2)
+    if rounds1 != rounds2:
+        return None
+    classes2 = {}
+    for v, colour in enumerate(colours2):
+        classes2.setdefault(colour, []).append(v)
+    if sorted(colours1) != sorted(colours2):
+        return None
+
+    # Map small colour classes first and then grow along edges, so most
+    # candidates are rejected by the adjacency test right away.
+    order = []
+    visited = [False] * graph1.num_nodes
+    for root in sorted(range(graph1.num_nodes), key=lambda v: (len(classes2[colours1[v]]), v)):
+        if visited[root]:
+            continue
+        visited[root] = True
+        queue = [root]
+        for v in queue:
+            order.append(v)
+            for u in sorted(graph1[v], key=lambda u: len(classes2[colours1[u]])):
+                if not visited[u]:
+                    visited[u] = True
+                    queue.append(u)
+
+    mapping = [None] * graph1.num_nodes
+    used = [False] * graph2.num_nodes
+    steps = 0
+
+    def consistent(v, w):
+        mapped_neighbours = 0
+        for u in graph1[v]:
+            if mapping[u] is not None:
+                if not graph2.are_adjacent(w, mapping[u]):
+                    return False
+                mapped_neighbours += 1
+        # w must not have more mapped neighbours than v.
+        return sum(1 for x in graph2[w] if used[x]) == mapped_neighbours
+
+    def get_candidates(v):
+        # Nodes of the same colour, next to the image of a mapped neighbour.
+        for u in graph1[v]:
+            if mapping[u] is not None:
+                return [w for w in graph2[mapping[u]] if colours2[w] == colours1[v]]
+        return classes2[colours1[v]]
+
+    # Iterative backtracking, so large graphs do not exceed the recursion limit.
+    candidates = [None] * len(order)
+    depth = 0
+    while 0 <= depth < len(order):
+        v = order[depth]
+        if candidates[depth] is None:
+            candidates[depth] = iter(get_candidates(v))
+        elif mapping[v] is not None:
+            used[mapping[v]] = False
+            mapping[v] = None
+        for w in candidates[depth]:
+            steps += 1
+            if steps > max_steps:
+                return None
+            if not used[w] and consistent(v, w):
+                mapping[v] = w
+                used[w] = True
+                depth += 1
+                break
+        else:
+            candidates[depth] = None
+            depth -= 1
+    if depth < 0:
+        return None
+    return mapping
@@ -0,0 +1,120 @@
+"""
+Settle easy instances before any planner is started.
+
+Every jump moves one token, so a plan needs at least |S - T| jumps. If all
+tokens can jump directly from S - T to T - S, such a plan is optimal. This
+is always possible if the bipartite graph induced by S - T and T - S is a
+forest, which includes S = T, independent S | T and every instance on a
+path, tree, chordal or, more generally, even-hole-free graph (Kaminski,
+Medvedev and Milanic, 2012): in a forest with as many nodes on both sides,
+some node of T - S has at most one neighbour in S - T, so a token can jump
+there, and the remaining forest has the same property.
+"""
+
+import os
+from pathlib import Path
+import tempfile
+
+from compile import write_answer
+from configs import EXISTENT_TRACK, SHORTEST_TRACK, Response, generate_unsolvable_response, read_instance
+
+
+def find_direct_plan(graph, start, target):
+    """
+    Try to move every token from S - T to T - S in |S - T| jumps. Return the
+    list of jumps or None if we get stuck. We never get stuck if the graph
+    induced by S - T and T - S is a forest, otherwise we might.
+    """
+    sources = start - target
+    destinations = target - start
+    if len(sources) != len(destinations):
+        return None
+    # A token can jump to a destination once at most one of its neighbours
+    # is still occupied (by the token that jumps).
+    num_occupied_neighbours = {
+        b: sum(1 for a in graph[b] if a in sources) for b in destinations}
+    ready = [b for b, num in num_occupied_neighbours.items() if num <= 1]
+    moves = []
+    while ready:
+        b = ready.pop()
+        if num_occupied_neighbours[b] == 1:
+            a = next(a for a in graph[b] if a in sources)
+        else:
+            a = next(iter(sources))
+        moves.append((a, b))
+        sources.remove(a)
+        del num_occupied_neighbours[b]
+        for neighbour in graph[a]:
+            if neighbour in num_occupied_neighbours:
+                num_occupied_neighbours[neighbour] -= 1
+                if num_occupied_neighbours[neighbour] == 1:
+                    ready.append(neighbour)
+    if sources:
+        return None
+    return moves
+
+
+def can_jump_first(graph, occupied, sources, nodes):
+    """
+    Check if a token on one of the sources can jump to one of the nodes as
+    the first jump of a plan starting in the occupied nodes.
+    """
+    for v in nodes:
+        occupied_neighbours = [u for u in graph[v] if u in occupied]
+        if len(occupied_neighbours) == 0 and sources:
+            return True
+        if len(occupied_neighbours) == 1 and occupied_neighbours[0] in sources:
+            return True
+    return False
+
+
+def lower_bound(graph, start, target):
+    """
+    Return a lower bound on the number of jumps of any plan.
+
+    Let d = |S - T|. Each jump changes the number of tokens outside of T by
+    at most one, so every plan has at least d jumps, and a plan with d + 1
+    jumps contains exactly one jump that does not move a token into T.
+    Without a direct first jump from S - T to T - S, this must be the first
+    jump, so it has to move a token from S - T to a node outside of S | T.
+    If that is impossible as well, the plan needs at least d + 2 jumps.
+    Reversing the plan gives the same argument for the last jump.
+    """
+    sources = start - target
+    destinations = target - start
+    d = len(sources)
+    if d == 0:
+        return 0
+
+    bound = d
+    outside = [v for v in graph if v not in start and v not in target]
+    for occupied, free, goal in [(start, sources, destinations), (target, destinations, sources)]:
+        if can_jump_first(graph, occupied, free, goal):
+            continue
+        if can_jump_first(graph, occupied, free, outside):
+            bound = max(bound, d + 1)
+        else:
+            bound = max(bound, d + 2)
+    return bound
+
+
+def presolve(track, graph, dat_filename, run_dir):
+    """
+    Return a response that cannot be improved for the given track, or None
+    if the instance has to be solved by the planners.
+    """
+    instance, start, target = read_instance(Path(dat_filename))
+    if len(start) != len(target):
+        # Jumps never change the number of tokens.
+        return generate_unsolvable_response(Path(dat_filename))
+    if track not in [SHORTEST_TRACK, EXISTENT_TRACK]:
+        return None
+
+    moves = find_direct_plan(graph, start, target)
+    if moves is None:
+        return None
+    fd, answer_filename = tempfile.mkstemp(prefix="answer_", dir=run_dir)
+    with os.fdopen(fd, "w") as out:
+        out.write(instance)
+        write_answer(out, start, moves)
+    return Response(Path(answer_filename), len(moves), is_shortest=True, is_longest=False)
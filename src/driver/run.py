@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
+import os
 from pathlib import Path
 import psutil
 import resource
 import signal
+import sys
 import tempfile
+import threading
+import time
 
-from configs import CONFIGS
-from compile import compile
+from cache import TaskCache, DEFAULT_CACHE_SIZE, file_digest
+from configs import CONFIGS, COLORING_FILENAME, ResponseCollector, TIME_BUFFER_FOR_RESPONSE, TIME_BUFFER_FOR_SOLVERS, TIME_BUFFER_FOR_TERMINATE
+from compile import parse_col_file, parse_dat_file, write_sas_file
+from features import compute_features
+from presolve import lower_bound, presolve
+from selection import SelectionModel
+from tracing import NULL_TRACER, Tracer
+
+SAS_STYLE = "split"
 
 def absolute_path(x):
     return str(Path(x).resolve())
@@ -19,16 +31,121 @@ def create_run_dir():
     return tempfile.mkdtemp(prefix="run_dir_", dir=Path(".").resolve())
 
 
-def run_config(config, memory_limit, time_limit, col_filename, dat_filename):
+class ResponseWriter(object):
+    """
+    Write the best response of the collector exactly once: either when the
+    configuration is done or when the deadline is reached, whichever comes first.
+    """
+    def __init__(self, collector, stats_filename=None, trace_filename=None):
+        self.collector = collector
+        self.stats_filename = stats_filename
+        self.trace_filename = trace_filename
+        self.lock = threading.Lock()
+        self.written = False
+
+    def write(self):
+        with self.lock:
+            if self.written:
+                return
+            self.written = True
+            # Either print output to stdout or write to file, we don't know.
+            with self.collector.tracer.span("write response"):
+                self.collector.write(sys.stdout)
+                sys.stdout.flush()
+            if self.stats_filename is not None:
+                with open(self.stats_filename, "w") as f:
+                    json.dump(self.collector.stats.to_json(), f, indent=2)
+            if self.trace_filename is not None:
+                self.collector.tracer.write(self.trace_filename)
+
+
+def start_deadline_timer(writer, seconds, cleanups):
+    """
+    Write the response at the deadline and exit, after the components are
+    terminated and the functions in cleanups are called.
+    """
+    def on_deadline():
+        writer.write()
+        terminate_children()
+        for cleanup in cleanups:
+            cleanup()
+        # The main thread may be blocked waiting for components, so exit directly.
+        os._exit(0)
+
+    timer = threading.Timer(max(seconds, 0), on_deadline)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def load_graph(cache, col_filename):
+    if cache is None:
+        return parse_col_file(col_filename)
+    # The parsed graph only depends on the col file, so it is shared by all
+    # dat files of the same graph.
+    graph_key = cache.key(file_digest(col_filename))
+    return cache.get_object(graph_key, "graph.pickle", lambda: parse_col_file(col_filename))
+
+
+def prepare_task(cache, task_key, graph, dat_filename, sas_filename):
+    """
+    Write the compiled task to sas_filename. The colouring the MIP checker
+    refined in an earlier run on the task is placed next to it.
+    """
+    def build_task(path):
+        start, target = parse_dat_file(dat_filename)
+        write_sas_file(SAS_STYLE, graph, start, target, path)
+
+    if cache is None:
+        build_task(sas_filename)
+        return
+
+    cache.get_file(task_key, "problem.sas", build_task, sas_filename)
+    cache.restore_file(task_key, COLORING_FILENAME, Path(sas_filename).parent / COLORING_FILENAME)
+
+
+def store_coloring(cache, task_key, sas_filename):
+    coloring_filename = Path(sas_filename).parent / COLORING_FILENAME
+    if cache is not None and coloring_filename.exists():
+        cache.store_file(task_key, COLORING_FILENAME, coloring_filename)
+
+
+def run_config(config, memory_limit, time_limit, col_filename, dat_filename, deadline, cache=None,
+               selection_model=None, stats_filename=None, trace_filename=None):
+    tracer = Tracer() if trace_filename is not None else NULL_TRACER
+    collector = ResponseCollector(config.track, tracer)
+    writer = ResponseWriter(collector, stats_filename, trace_filename)
+    cleanups = []
+    timer = start_deadline_timer(writer, deadline - time.monotonic(), cleanups)
     run_dir = create_run_dir()
-    sas_filename = str(Path(run_dir) / "problem.sas")
-    compile("split", col_filename, dat_filename, sas_filename)
-    response = config.run(run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename)
-    # Either print output to stdout or write to file, we don't know.
+    with tracer.span("load graph"):
+        graph = load_graph(cache, col_filename)
+    with tracer.span("presolve"):
+        response = presolve(config.track, graph, dat_filename, run_dir)
     if response is not None:
-        print(response)
+        collector.add(response)
     else:
-        print("c UNKNOWN")
+        start, target = parse_dat_file(dat_filename)
+        with tracer.span("lower bound"):
+            collector.set_lower_bound(lower_bound(graph, start, target))
+        if selection_model is not None:
+            with tracer.span("select config"):
+                config = selection_model.select_config(config, compute_features(graph, start, target))
+        sas_filename = str(Path(run_dir) / "problem.sas")
+        task_key = None
+        if cache is not None:
+            task_key = cache.key(file_digest(col_filename), file_digest(dat_filename), SAS_STYLE)
+        with tracer.span("compile", cached=cache is not None):
+            prepare_task(cache, task_key, graph, dat_filename, sas_filename)
+        # Keep the colouring of the MIP checker for later runs, also if the
+        # deadline stops this one.
+        cleanups.append(lambda: store_coloring(cache, task_key, sas_filename))
+        with tracer.span("search"):
+            config.run(run_dir, memory_limit, time_limit, col_filename, dat_filename, sas_filename, collector, graph)
+    timer.cancel()
+    writer.write()
+    for cleanup in cleanups:
+        cleanup()
 
 
 def parse_options():
@@ -36,6 +153,18 @@ def parse_options():
     parser.add_argument("--config", choices=CONFIGS.keys(), required=True)
     parser.add_argument("--memory-limit", type=int)
     parser.add_argument("--time-limit", type=int)
+    parser.add_argument("--cache-dir", type=absolute_path,
+                        help="reuse compiled tasks and colourings of the MIP checker from this directory (disabled by default)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+                        help="maximal size of the cache in MB (default: %(default)s)")
+    parser.add_argument("--selection-model", type=absolute_path,
+                        help="choose the portfolio for the track of the config with this model "
+                             "(see selection.py)")
+    parser.add_argument("--stats", type=absolute_path,
+                        help="write timings and memory usage of the run to this JSON file")
+    parser.add_argument("--trace", type=absolute_path,
+                        help="write a trace of the run to this file (Chrome trace format, "
+                             "open it in chrome://tracing or ui.perfetto.dev)")
     parser.add_argument("col_filename", type=absolute_path)
     parser.add_argument("dat_filename", type=absolute_path)
     return parser.parse_args()
@@ -50,7 +179,16 @@ def forward_signal_to_children(s, _):
     for child in current_process.children(recursive=False):
         child.send_signal(s)
 
+def terminate_children():
+    children = psutil.Process().children(recursive=True)
+    for child in children:
+        try:
+            child.kill()
+        except psutil.NoSuchProcess:
+            pass
+
 def main():
+    started = time.monotonic()
     register_signal_handlers()
     args = parse_options()
     config = CONFIGS[args.config]
@@ -63,14 +201,24 @@ def main():
 
     time_limit = args.time_limit  
 
+    time_buffer = TIME_BUFFER_FOR_RESPONSE + TIME_BUFFER_FOR_SOLVERS + TIME_BUFFER_FOR_TERMINATE
     if time_limit is None:
         time_limit, _ = resource.getrlimit(resource.RLIMIT_CPU)
-    elif time_limit <= 60:
-        print(f"Warning: Time limit ({time_limit}s) is lower than our postprocessing time of 60 sec.")
+    elif time_limit <= time_buffer:
+        print(f"Warning: Time limit ({time_limit}s) is lower than our postprocessing time of {time_buffer} sec.")
         exit(1)
 
+    cache = None
+    if args.cache_dir is not None:
+        cache = TaskCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    selection_model = None
+    if args.selection_model is not None:
+        selection_model = SelectionModel.load(args.selection_model)
 
-    run_config(config, memory_limit, time_limit, args.col_filename, args.dat_filename)
+    deadline = started + time_limit - TIME_BUFFER_FOR_RESPONSE
+    run_config(config, memory_limit, time_limit, args.col_filename, args.dat_filename, deadline, cache,
+               selection_model, args.stats, args.trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+"""
+Choose the portfolio for an instance from its features (see features.py).
+
+The model is trained offline from benchmark runs. Every run is one line of
+a JSONL file with the fields
+
+    {"col": ..., "dat": ..., "track": "shortest",
+     "portfolio": ["scorpion-anytime", "symk-short"],
+     "solved": true, "time": 12.3}
+
+where the portfolio lists component names from configs.COMPONENTS in the
+order they are started, and "time" is the wall-clock time until the run
+solved the instance. Runs may also contain precomputed "features".
+
+For a new instance, the model looks at the most similar training instances
+and picks the portfolio with the lowest penalized running time (PAR2) on
+them. Memory and CPUs are shared dynamically between the components of a
+portfolio, so the model only chooses components and their order.
+
+Usage:
+    selection.py train RUNS --time-limit T --output MODEL
+    selection.py evaluate RUNS --time-limit T
+"""
+
+import argparse
+from collections import defaultdict
+import json
+import math
+import sys
+
+from configs import COMPONENTS, PortfolioConfig, get_component_names
+from features import FEATURE_NAMES, compute_instance_features
+
+DEFAULT_NUM_NEIGHBOURS = 5
+
+# Features that span orders of magnitude are compared on a log scale.
+LOG_SCALE_FEATURES = {
+    "num_nodes", "num_edges", "num_tokens", "min_degree", "max_degree",
+    "mean_degree", "degree_stddev", "symmetric_difference"}
+
+
+def transform(features):
+    return [math.log1p(features[name]) if name in LOG_SCALE_FEATURES else features[name]
+            for name in FEATURE_NAMES]
+
+
+def penalized_time(run, time_limit):
+    if run is None or not run["solved"] or run["time"] > time_limit:
+        return 2 * time_limit
+    return run["time"]
+
+
+class TrackModel(object):
+    """
+    k-nearest-neighbour model for one track. Each example holds the
+    transformed features of an instance and the PAR2 score of every
+    portfolio on it.
+    """
+    def __init__(self, portfolios, examples, num_neighbours=DEFAULT_NUM_NEIGHBOURS):
+        self.portfolios = portfolios
+        self.examples = examples
+        self.num_neighbours = num_neighbours
+        vectors = [vector for vector, _ in examples]
+        self.mean = [sum(column) / len(column) for column in zip(*vectors)]
+        self.scale = [
+            math.sqrt(sum((x - mean) ** 2 for x in column) / len(column)) or 1.0
+            for column, mean in zip(zip(*vectors), self.mean)]
+
+    def distance(self, v1, v2):
+        return math.sqrt(sum(((x - y) / s) ** 2 for x, y, s in zip(v1, v2, self.scale)))
+
+    def predict(self, features, exclude=None):
+        """
+        Return the portfolio with the lowest total score on the nearest
+        examples, ignoring the example with index exclude.
+        """
+        vector = transform(features)
+        neighbours = sorted(
+            (self.distance(vector, example_vector), i)
+            for i, (example_vector, _) in enumerate(self.examples) if i != exclude)
+        neighbours = neighbours[:self.num_neighbours]
+        totals = [0.0] * len(self.portfolios)
+        for _, i in neighbours:
+            for j, score in enumerate(self.examples[i][1]):
+                totals[j] += score
+        best = min(range(len(self.portfolios)), key=lambda j: (totals[j], j))
+        return self.portfolios[best]
+
+    def to_json(self):
+        return {
+            "portfolios": self.portfolios,
+            "examples": [{"features": vector, "scores": scores} for vector, scores in self.examples],
+            "num_neighbours": self.num_neighbours,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        examples = [(example["features"], example["scores"]) for example in data["examples"]]
+        return cls(data["portfolios"], examples, data["num_neighbours"])
+
+
+class SelectionModel(object):
+    def __init__(self, track_models):
+        self.track_models = track_models
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            data = json.load(f)
+        return cls({track: TrackModel.from_json(model) for track, model in data["tracks"].items()})
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump({"tracks": {track: model.to_json() for track, model in self.track_models.items()}}, f)
+
+    def select_config(self, config, features):
+        """
+        Return the portfolio chosen for an instance with the given features.
+        Only the components of portfolios are reordered or replaced, so
+        config itself is returned if it runs a single component or if the
+        model does not cover its track. The other settings of the portfolio
+        are kept.
+        """
+        if not isinstance(config, PortfolioConfig) or len(config.components) <= 1:
+            return config
+        model = self.track_models.get(config.track)
+        if model is None:
+            return config
+        # Keep the configured instances of components the portfolio has.
+        available = dict(zip(get_component_names(config), config.components))
+        components = [available.pop(name, None) or COMPONENTS[name]() for name in model.predict(features)]
+        return PortfolioConfig(config.track, components, elastic_memory=config.elastic_memory, race=config.race)
+
+
+def read_runs(filename):
+    """
+    Return a dictionary mapping each track to a dictionary that maps every
+    instance (col, dat) to its features and its runs by portfolio.
+    """
+    tracks = defaultdict(dict)
+    features_by_instance = {}
+    with open(filename) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            run = json.loads(line)
+            instance = (run["col"], run["dat"])
+            if instance not in features_by_instance:
+                features_by_instance[instance] = (
+                    run.get("features") or compute_instance_features(*instance))
+            entry = tracks[run["track"]].setdefault(
+                instance, {"features": features_by_instance[instance], "runs": {}})
+            entry["runs"][tuple(run["portfolio"])] = run
+    return tracks
+
+
+def build_track_model(instances, time_limit, num_neighbours):
+    portfolios = sorted(set(p for entry in instances.values() for p in entry["runs"]))
+    examples = []
+    for entry in instances.values():
+        scores = [penalized_time(entry["runs"].get(p), time_limit) for p in portfolios]
+        examples.append((transform(entry["features"]), scores))
+    return TrackModel([list(p) for p in portfolios], examples, num_neighbours)
+
+
+def train(runs_filename, time_limit, num_neighbours):
+    tracks = read_runs(runs_filename)
+    return SelectionModel({
+        track: build_track_model(instances, time_limit, num_neighbours)
+        for track, instances in tracks.items()})
+
+
+def evaluate(runs_filename, time_limit, num_neighbours):
+    """
+    Compare the selector (with leave-one-out cross-validation) to every
+    fixed portfolio and to the virtual best portfolio per instance.
+    """
+    for track, instances in sorted(read_runs(runs_filename).items()):
+        model = build_track_model(instances, time_limit, num_neighbours)
+        results = defaultdict(list)
+        for i, entry in enumerate(instances.values()):
+            scores = dict(zip(map(tuple, model.portfolios), model.examples[i][1]))
+            for portfolio, score in scores.items():
+                results["+".join(portfolio)].append(score)
+            results["virtual best"].append(min(scores.values()))
+            selected = tuple(model.predict(entry["features"], exclude=i))
+            results["selector"].append(scores[selected])
+
+        print(f"{track} ({len(instances)} instances)")
+        print(f"  {'portfolio':40} {'solved':>6} {'PAR2':>10}")
+        for name, scores in sorted(results.items(), key=lambda item: sum(item[1])):
+            solved = sum(1 for score in scores if score < 2 * time_limit)
+            print(f"  {name:40} {solved:6d} {sum(scores) / len(scores):10.2f}")
+
+
+def parse_options():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("runs", help="JSONL file with benchmark runs")
+    parser.add_argument("--time-limit", type=float, required=True,
+                        help="time limit of the runs in seconds, used for the PAR2 score")
+    parser.add_argument("--neighbours", type=int, default=DEFAULT_NUM_NEIGHBOURS)
+    parser.add_argument("--output", help="model file written by train")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_options()
+    if args.command == "train":
+        if args.output is None:
+            sys.exit("train needs --output")
+        train(args.runs, args.time_limit, args.neighbours).save(args.output)
+    else:
+        evaluate(args.runs, args.time_limit, args.neighbours)
+
+
+if __name__ == "__main__":
+    main()
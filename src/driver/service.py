@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+"""
+Local solving service. Accepts jobs over HTTP on localhost, runs them with
+run.py on a fixed number of slots and caches the answers.
+
+    POST /jobs      {"col": PATH, "dat": PATH, "config": NAME,
+                     "time_limit": SECONDS, "wait": false}
+                    -> {"id": ID, "state": ...}
+    GET  /jobs/ID   -> {"id": ID, "state": "queued|running|done",
+                        "status": "YES|NO|UNKNOWN", "answer": TEXT, "cached": BOOL}
+
+The time limit of a job counts from its submission, so time spent in the
+queue is deducted. Like in batch.py, every slot gets its own CPUs and the
+number of slots is limited by the memory budget.
+
+Answers are cached under a hash of the instance that does not depend on
+the names of the nodes (see isomorphism.py). On a hit, the cached plan is
+translated along an explicit isomorphism and validated again, so repeated
+and relabelled instances are answered without running a planner. On the
+shortest and longest tracks, plans are only cached if the run proved them
+optimal: an anytime plan found before the time limit may be beaten by a
+run with more time. Plans are kept as lists of jumps, and the cache is
+limited by the bytes of its plans and graphs.
+
+Finished jobs are forgotten once their answer has been sent, or JOB_TTL
+seconds after they finished if nobody fetches it.
+
+Usage: service.py [--port PORT] [--jobs N] [--memory-limit GB] [--memory-budget GB] [--cache-size MB]
+"""
+
+import argparse
+from array import array
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import itertools
+import json
+import os
+from pathlib import Path
+import psutil
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from compile import parse_col_file, parse_dat_file, to_var_id, validate_moves, write_answer
+from configs import CONFIGS, LONGEST_TRACK, SHORTEST_TRACK, TIME_BUFFER_FOR_RESPONSE, TIME_BUFFER_FOR_SOLVERS, \
+    TIME_BUFFER_FOR_TERMINATE, generate_unsolvable_response
+from isomorphism import find_isomorphism, instance_hash
+
+RUN_PY = str(Path(__file__).resolve().parent / "run.py")
+DEFAULT_PORT = 8642
+DEFAULT_CACHE_SIZE = 256
+# Seconds a finished job is kept if its answer is never fetched.
+JOB_TTL = 3600
+MIN_TIME_LIMIT = TIME_BUFFER_FOR_RESPONSE + TIME_BUFFER_FOR_SOLVERS + TIME_BUFFER_FOR_TERMINATE + 1
+MB = 1024 * 1024
+GB = 1024 * MB
+
+STATUS_PATTERN = re.compile(r"^a (YES|NO)\b", re.MULTILINE)
+
+
+def answer_status(answer):
+    match = STATUS_PATTERN.search(answer)
+    return match.group(1) if match else "UNKNOWN"
+
+
+def parse_answer_moves(answer):
+    """
+    Return the jumps of a YES answer as a flat array [from_0, to_0, from_1,
+    to_1, ...] of var ids, or None if two consecutive states do not differ
+    in exactly one jump. Only two states are kept at a time.
+    """
+    moves = array("i")
+    state = None
+    for line in answer.splitlines():
+        if not line.startswith("a ") or line.startswith(("a YES", "a NO")):
+            continue
+        next_state = set(to_var_id(x) for x in line[2:].split())
+        if state is not None:
+            removed = state - next_state
+            added = next_state - state
+            if len(removed) != 1 or len(added) != 1:
+                return None
+            moves.append(removed.pop())
+            moves.append(added.pop())
+        state = next_state
+    return moves
+
+
+class CachedResult(object):
+    def __init__(self, graph, start, target, status, moves):
+        self.graph = graph
+        self.start = start
+        self.target = target
+        self.status = status
+        self.moves = moves
+
+    def size(self):
+        """
+        Estimate the bytes of the plan and the graph, which dominate the
+        memory of a result.
+        """
+        arrays = [self.graph.offsets, self.graph.neighbours]
+        if self.moves is not None:
+            arrays.append(self.moves)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+class ResultCache(object):
+    """
+    Map (track, instance hash) to the answers of the instances with this
+    hash. Hashes are evicted in least-recently-used order once the results
+    take more than max_size bytes.
+    """
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE * MB):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, track, key, graph, start, target, dat_filename):
+        with self.lock:
+            results = list(self.entries.get((track, key), []))
+            if results:
+                self.entries.move_to_end((track, key))
+        for result in results:
+            mapping = find_isomorphism(result.graph, result.start, result.target, graph, start, target)
+            if mapping is None:
+                continue
+            if result.status == "NO":
+                return str(generate_unsolvable_response(Path(dat_filename)))
+            moves = [(mapping[u], mapping[v]) for u, v in zip(result.moves[0::2], result.moves[1::2])]
+            if not validate_moves(graph, start, target, moves):
+                continue
+            out = io.StringIO()
+            out.write(Path(dat_filename).read_text())
+            write_answer(out, start, moves)
+            return out.getvalue().rstrip("\n")
+        return None
+
+    def store(self, track, key, graph, start, target, answer, proven):
+        """
+        Cache the answer unless it is unknown or a plan that was not proven
+        optimal for the track.
+        """
+        status = answer_status(answer)
+        if status == "UNKNOWN":
+            return
+        if status == "YES" and track in (SHORTEST_TRACK, LONGEST_TRACK) and not proven:
+            return
+        moves = parse_answer_moves(answer) if status == "YES" else None
+        if status == "YES" and moves is None:
+            return
+        result = CachedResult(graph, start, target, status, moves)
+        result_size = result.size()
+        if result_size > self.max_size:
+            return
+        with self.lock:
+            self.entries.setdefault((track, key), []).append(result)
+            self.entries.move_to_end((track, key))
+            self.size += result_size
+            while self.size > self.max_size:
+                _, results = self.entries.popitem(last=False)
+                self.size -= sum(r.size() for r in results)
+
+
+class Job(object):
+    def __init__(self, job_id, col_filename, dat_filename, config_name, time_limit):
+        self.id = job_id
+        self.col_filename = col_filename
+        self.dat_filename = dat_filename
+        self.config_name = config_name
+        self.deadline = time.monotonic() + time_limit
+        self.state = "queued"
+        self.status = None
+        self.answer = None
+        self.cached = False
+        self.done = threading.Event()
+        self.graph = None
+        self.start = None
+        self.target = None
+        self.key = None
+
+    def finish(self, answer, cached):
+        self.answer = answer
+        self.status = answer_status(answer)
+        self.cached = cached
+        # Only the answer is needed from now on.
+        self.graph = self.start = self.target = None
+        self.state = "done"
+        self.done.set()
+
+    def to_json(self):
+        result = {"id": self.id, "state": self.state}
+        if self.state == "done":
+            result.update(status=self.status, answer=self.answer, cached=self.cached)
+        return result
+
+
+class SolverService(object):
+    def __init__(self, num_slots, cpus, memory_limit, work_dir, cache_size=DEFAULT_CACHE_SIZE * MB):
+        self.memory_limit = memory_limit
+        self.work_dir = work_dir
+        self.cache = ResultCache(cache_size)
+        self.queue = queue.Queue()
+        self.jobs = {}
+        # Finish times of the jobs in self.jobs that are done, oldest first.
+        self.finished = OrderedDict()
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        for i in range(num_slots):
+            threading.Thread(target=self.work, args=(cpus[i::num_slots],), daemon=True).start()
+
+    def submit(self, col_filename, dat_filename, config_name, time_limit):
+        graph = parse_col_file(col_filename)
+        start, target = parse_dat_file(dat_filename)
+        with self.lock:
+            self.expire_jobs()
+            job = Job(next(self.job_ids), col_filename, dat_filename, config_name, time_limit)
+            self.jobs[job.id] = job
+        job.graph, job.start, job.target = graph, start, target
+        job.key = instance_hash(graph, start, target)
+        if not self.answer_from_cache(job):
+            self.queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            self.expire_jobs()
+            return self.jobs.get(job_id)
+
+    def release(self, job):
+        """
+        Forget a finished job after its answer has been sent.
+        """
+        with self.lock:
+            self.jobs.pop(job.id, None)
+            self.finished.pop(job.id, None)
+
+    def expire_jobs(self):
+        # Called with self.lock held.
+        now = time.monotonic()
+        while self.finished:
+            job_id, finished = next(iter(self.finished.items()))
+            if now - finished < JOB_TTL:
+                break
+            self.finished.popitem(last=False)
+            self.jobs.pop(job_id, None)
+
+    def finish(self, job, answer, cached):
+        job.finish(answer, cached)
+        with self.lock:
+            if job.id in self.jobs:
+                self.finished[job.id] = time.monotonic()
+
+    def answer_from_cache(self, job):
+        answer = self.cache.lookup(
+            CONFIGS[job.config_name].track, job.key, job.graph, job.start, job.target, job.dat_filename)
+        if answer is None:
+            return False
+        self.finish(job, answer, cached=True)
+        return True
+
+    def work(self, cpus):
+        while True:
+            job = self.queue.get()
+            # An equivalent job may have finished while this one was queued.
+            if not self.answer_from_cache(job):
+                job.state = "running"
+                answer, proven = self.run(job, cpus)
+                self.cache.store(CONFIGS[job.config_name].track, job.key, job.graph, job.start, job.target,
+                                 answer, proven)
+                self.finish(job, answer, cached=False)
+
+    def run(self, job, cpus):
+        """
+        Return the answer of run.py and whether it is known to be optimal
+        for the track of the job.
+        """
+        time_limit = int(job.deadline - time.monotonic())
+        if time_limit < MIN_TIME_LIMIT:
+            return "c UNKNOWN", False
+        with tempfile.TemporaryDirectory(prefix="job_", dir=self.work_dir) as job_dir:
+            stats_filename = Path(job_dir) / "stats.json"
+            cmd = [sys.executable, RUN_PY, "--config", job.config_name,
+                   "--memory-limit", str(self.memory_limit), "--time-limit", str(time_limit),
+                   "--stats", str(stats_filename), job.col_filename, job.dat_filename]
+            # Set the affinity before run.py starts, so the compilation and
+            # all components it starts are bound to the CPUs of the slot.
+            process = subprocess.Popen(cmd, cwd=job_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                       text=True, preexec_fn=lambda: os.sched_setaffinity(0, cpus))
+            answer, _ = process.communicate()
+            try:
+                proven = json.loads(stats_filename.read_text()).get("best_response_proven", False)
+            except (OSError, ValueError):
+                proven = False
+        return answer.strip() or "c UNKNOWN", proven
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def send_json(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self.send_json(404, {"error": "unknown path"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if request["config"] not in CONFIGS:
+                raise ValueError(f"unknown config {request['config']}")
+            job = self.server.service.submit(
+                str(Path(request["col"]).resolve()), str(Path(request["dat"]).resolve()),
+                request["config"], float(request["time_limit"]))
+        except (KeyError, ValueError, TypeError, OSError, AssertionError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        if request.get("wait"):
+            job.done.wait()
+        self.send_job(job)
+
+    def send_job(self, job):
+        data = job.to_json()
+        if data["state"] == "done":
+            self.server.service.release(job)
+        self.send_json(200, data)
+
+    def do_GET(self):
+        prefix = "/jobs/"
+        job = None
+        if self.path.startswith(prefix) and self.path[len(prefix):].isdigit():
+            job = self.server.service.get(int(self.path[len(prefix):]))
+        if job is None:
+            self.send_json(404, {"error": "unknown job"})
+        else:
+            self.send_job(job)
+
+
+def parse_options():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--jobs", type=int, help="maximal number of parallel runs (default: number of CPUs)")
+    parser.add_argument("--memory-limit", type=int, default=4, help="per run, in GB (default: %(default)s)")
+    parser.add_argument("--memory-budget", type=float,
+                        help="for all parallel runs together, in GB (default: physical memory)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="for the cached plans and graphs, in MB (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_options()
+    cpus = sorted(os.sched_getaffinity(0))
+    memory_budget = args.memory_budget or psutil.virtual_memory().total / GB
+    num_slots = max(1, min(args.jobs or len(cpus), len(cpus), int(memory_budget // args.memory_limit)))
+    with tempfile.TemporaryDirectory(prefix="service_") as work_dir:
+        service = SolverService(num_slots, cpus, args.memory_limit, work_dir, args.cache_size * MB)
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), RequestHandler)
+        server.service = service
+        print(f"Listening on 127.0.0.1:{args.port} with {num_slots} slots", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
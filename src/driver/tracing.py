@@ -0,0 +1,117 @@
+"""
+Record what the driver does during a run as a trace in the Chrome trace
+event format, which can be opened in chrome://tracing or ui.perfetto.dev
+(see run.py --trace).
+
+The driver's own phases appear on the first row and every component gets a
+row of its own with its lifetime, the plans it found and its memory usage.
+Without --trace, the driver uses NULL_TRACER, whose methods do nothing.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+DRIVER_TRACK = "driver"
+
+
+def to_json_value(value):
+    # Infinite costs stand for unsolvability, but JSON has no infinity.
+    if isinstance(value, float) and value == float("inf"):
+        return "inf"
+    return value
+
+
+class Tracer(object):
+    enabled = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.tracks = {}
+        self.lock = threading.Lock()
+        self.get_tid(DRIVER_TRACK)
+
+    def timestamp(self):
+        # The trace format counts in microseconds.
+        return round((time.perf_counter() - self.started) * 1e6)
+
+    def get_tid(self, track, name=None):
+        """
+        Return the row of a track, e.g., the run directory of a component.
+        The row is labelled with name (by default the track itself) when the
+        track is used for the first time.
+        """
+        with self.lock:
+            tid = self.tracks.get(track)
+            if tid is None:
+                tid = self.tracks[track] = len(self.tracks)
+                self.events.append({
+                    "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                    "args": {"name": name or str(track)}})
+            return tid
+
+    def add(self, name, phase, track, timestamp=None, **fields):
+        event = {
+            "name": name, "ph": phase, "pid": self.pid, "tid": self.get_tid(track),
+            "ts": self.timestamp() if timestamp is None else timestamp}
+        event.update(fields)
+        with self.lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, track=DRIVER_TRACK, **args):
+        started = self.timestamp()
+        try:
+            yield
+        finally:
+            self.add(name, "X", track, started, dur=self.timestamp() - started,
+                     args={key: to_json_value(value) for key, value in args.items()})
+
+    def instant(self, name, track=DRIVER_TRACK, **args):
+        self.add(name, "i", track, s="t", args={key: to_json_value(value) for key, value in args.items()})
+
+    def begin(self, name, track, label=None, **args):
+        self.get_tid(track, label)
+        self.add(name, "B", track, args={key: to_json_value(value) for key, value in args.items()})
+
+    def end(self, track, **args):
+        self.add("", "E", track, args={key: to_json_value(value) for key, value in args.items()})
+
+    def counter(self, name, track=DRIVER_TRACK, **values):
+        self.add(name, "C", track, args=values)
+
+    def write(self, filename):
+        with self.lock:
+            events = list(self.events)
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class NullTracer(object):
+    enabled = False
+
+    def span(self, name, track=DRIVER_TRACK, **args):
+        return NULL_SPAN
+
+    def instant(self, name, track=DRIVER_TRACK, **args):
+        pass
+
+    def begin(self, name, track, label=None, **args):
+        pass
+
+    def end(self, track, **args):
+        pass
+
+    def counter(self, name, track=DRIVER_TRACK, **values):
+        pass
+
+    def write(self, filename):
+        pass
+
+
+NULL_SPAN = contextlib.nullcontext()
+NULL_TRACER = NullTracer()
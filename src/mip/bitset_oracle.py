@@ -0,0 +1,117 @@
+"""
+Feasibility of abstract states without a MIP solver.
+
+An abstract state is feasible if the graph has an independent set with
+abstract_state[c] nodes of every colour c. Since subsets of independent
+sets are independent, it suffices to find one with at least that many
+nodes of every colour. BitsetOracle searches for it by branch and bound
+over node sets represented as integers, using the neighbour bitmasks of
+the graph: it branches on including or excluding a node of the colour
+with the least slack and prunes a branch if a greedy clique cover shows
+that the remaining candidates cannot hold enough independent nodes.
+
+The bitmasks take num_nodes**2 / 8 bytes, so the oracle is meant for
+small and medium graphs.
+"""
+
+# Larger graphs are left to the MIP solvers if one is installed.
+MAX_NODES = 512
+# Queries that need more branch-and-bound nodes are left undecided.
+MAX_STEPS = 100000
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def lowest_node(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def iterate_nodes(mask):
+    while mask:
+        v = lowest_node(mask)
+        yield v
+        mask &= mask - 1
+
+
+class BitsetOracle(object):
+    def __init__(self, graph, coloring, max_steps=MAX_STEPS):
+        self.masks = graph.neighbour_masks()
+        self.coloring = coloring
+        self.num_colors = max(coloring) + 1
+        self.color_masks = [0] * self.num_colors
+        for v, color in enumerate(coloring):
+            self.color_masks[color] |= 1 << v
+        self.max_steps = max_steps
+        self.num_steps = 0
+
+    def clique_cover_size(self, mask):
+        """
+        Return the number of cliques in a greedy partition of the nodes in
+        mask into cliques. No independent set within mask is larger.
+        """
+        masks = self.masks
+        num_cliques = 0
+        while mask:
+            v = lowest_node(mask)
+            clique = 1 << v
+            candidates = mask & masks[v]
+            while candidates:
+                u = lowest_node(candidates)
+                clique |= 1 << u
+                candidates &= masks[u]
+            mask &= ~clique
+            num_cliques += 1
+        return num_cliques
+
+    def can_satisfy(self, candidates, required):
+        needed_mask = 0
+        for color, count in enumerate(required):
+            if count:
+                color_candidates = candidates & self.color_masks[color]
+                if popcount(color_candidates) < count:
+                    return False
+                needed_mask |= color_candidates
+        for color, count in enumerate(required):
+            if count > 1 and self.clique_cover_size(candidates & self.color_masks[color]) < count:
+                return False
+        return self.clique_cover_size(needed_mask) >= sum(required)
+
+    def choose_node(self, candidates, required):
+        # The colour with the fewest candidates per required node, and
+        # within it the node that excludes the fewest other candidates.
+        color = min((c for c, count in enumerate(required) if count),
+                    key=lambda c: popcount(candidates & self.color_masks[c]) / required[c])
+        return min(iterate_nodes(candidates & self.color_masks[color]),
+                   key=lambda v: popcount(candidates & self.masks[v]))
+
+    def find_independent_set(self, abstract_state):
+        """
+        Return a pair (feasible, nodes) like satisfiable.find_independent_set,
+        with feasible None if the search needed more than max_steps steps.
+        """
+        all_nodes = 0
+        for mask in self.color_masks:
+            all_nodes |= mask
+        stack = [(all_nodes, tuple(abstract_state), [])]
+        steps = 0
+        while stack:
+            candidates, required, chosen = stack.pop()
+            if not any(required):
+                self.num_steps += steps
+                return True, chosen
+            steps += 1
+            if steps > self.max_steps:
+                self.num_steps += steps
+                return None, None
+            if not self.can_satisfy(candidates, required):
+                continue
+            v = self.choose_node(candidates, required)
+            remaining = list(required)
+            remaining[self.coloring[v]] -= 1
+            # Explore including v first, greedy choices often succeed.
+            stack.append((candidates & ~(1 << v), required, chosen))
+            stack.append((candidates & ~(1 << v) & ~self.masks[v], tuple(remaining), chosen + [v]))
+        self.num_steps += steps
+        return False, None
@@ -1,10 +1,37 @@
 #!/usr/bin/env python3
 
-from parse import parse_col_file, parse_dat_file
-from search import DepthFirstSearch
+"""
+Prove that an instance is unsolvable with counter abstractions.
+
+    check-unsolvability.py COL DAT [--time-limit SECONDS] [--coloring FILE]
+
+The nodes start with four colours (in start, in goal, in both, in neither)
+and an abstract state counts the tokens on every colour. If no abstract
+path leads from the start to the goal, the instance is unsolvable (exit
+code 10). Otherwise the abstract path is checked against the graph, and
+if it has no concrete counterpart, the colouring is refined and the search
+repeats until the time limit. The exit code is 1 if the instance could
+not be proved unsolvable.
+
+Every colouring gives a sound abstraction, so a run may start from the
+colouring an earlier run refined (--coloring), e.g., kept in the cache of
+the driver.
+"""
 
+import argparse
 from collections import Counter
+import itertools
+import os
+from pathlib import Path
 import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "common"))
+from graph import parse_col_file, parse_dat_file
+from bitset_oracle import MAX_NODES
+from refinement import concretize_path, refine_coloring
+from satisfiable import has_mip
+from search import DepthFirstSearch
 
 
 
@@ -18,22 +45,85 @@ def get_abstract_state(concrete_state, coloring):
     return tuple(count[color] for color in range(num_colors))
 
 
+def read_coloring(filename, num_nodes):
+    """
+    Return the colouring stored in the file, or None if there is none for
+    a graph with this number of nodes.
+    """
+    try:
+        with open(filename) as f:
+            coloring = [int(color) for color in f.read().split()]
+    except (OSError, ValueError):
+        return None
+    # Abstract states index the colours, so they must be 0, ..., k-1.
+    if len(coloring) != num_nodes or set(coloring) != set(range(max(coloring, default=-1) + 1)):
+        return None
+    return coloring
+
+
+def write_coloring(filename, coloring):
+    # The checker may be killed at any time, so replace the file atomically.
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "w") as f:
+        f.write(" ".join(map(str, coloring)) + "\n")
+    os.replace(tmp_filename, filename)
+
+
+def parse_options():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("col")
+    parser.add_argument("dat")
+    parser.add_argument("--time-limit", type=float,
+                        help="stop refining the colouring after this many seconds (default: no limit)")
+    parser.add_argument("--workers", type=int,
+                        help="processes checking abstract states (default: number of CPUs the checker may use)")
+    parser.add_argument("--coloring",
+                        help="start from the colouring in this file if it exists and "
+                             "write every refined colouring to it")
+    return parser.parse_args()
+
+
 def main():
-    num_nodes, edges = parse_col_file(sys.argv[1])
-    start_state, goal_state = parse_dat_file(sys.argv[2])
-    coloring = [color_of(p, start_state, goal_state) for p in range(num_nodes)]
-
-    abs_initial_state = get_abstract_state(start_state, coloring)
-    abs_goal_state = get_abstract_state(goal_state, coloring)
-
-    search = DepthFirstSearch(edges, coloring)
-    result = search.run(abs_initial_state, abs_goal_state)
-    if result:
-        print("Unknown")
-        sys.exit(1)
-    else:
-        print("Unsolvable")
-        sys.exit(10)
+    args = parse_options()
+    deadline = time.monotonic() + args.time_limit if args.time_limit else None
+    graph = parse_col_file(args.col)
+    start_state, goal_state = parse_dat_file(args.dat)
+    coloring = None
+    if args.coloring:
+        coloring = read_coloring(args.coloring, graph.num_nodes)
+    if coloring is None:
+        coloring = [color_of(p, start_state, goal_state) for p in range(graph.num_nodes)]
+
+    # The bitset oracle avoids the overhead of a MIP per state on small
+    # graphs and is the only option without a MIP library.
+    technique = "BB" if graph.num_nodes <= MAX_NODES or not has_mip else "LP"
+    # The driver pins the checker to the CPUs the other components leave.
+    num_workers = args.workers or len(os.sched_getaffinity(0))
+    print(f"Checking abstract states with {num_workers} worker(s)")
+    for iteration in itertools.count(1):
+        abs_initial_state = get_abstract_state(start_state, coloring)
+        abs_goal_state = get_abstract_state(goal_state, coloring)
+        print(f"Iteration {iteration}: {max(coloring) + 1} colours")
+        search = DepthFirstSearch(graph, coloring, technique, num_workers)
+        path = search.run(abs_initial_state, abs_goal_state)
+        if path is None:
+            print("Unsolvable")
+            sys.exit(10)
+        moves, failed_colors = concretize_path(graph, start_state, goal_state, coloring, path, deadline=deadline)
+        if moves is not None:
+            print(f"The abstract path of length {len(path) - 1} is a plan")
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        coloring = refine_coloring(graph, start_state, goal_state, coloring, failed_colors)
+        if coloring is None:
+            break
+        if args.coloring:
+            write_coloring(args.coloring, coloring)
+        print(f"Spurious abstract path of length {len(path) - 1}, "
+              f"refining colours {sorted(failed_colors)}")
+    print("Unknown")
+    sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,308 @@
+"""
+Cache for the feasibility of abstract states.
+
+An abstract state gives the number of tokens on every colour, and it is
+feasible if the graph has an independent set with these counts.
+Feasibility is downward closed: removing tokens from an independent set
+leaves an independent set. So a feasible state answers every state it
+dominates componentwise, and an infeasible state answers every state that
+dominates it. The cache keeps the maximal feasible and the minimal
+infeasible states it knows and only calls the solver for states neither
+of them decides.
+
+All states of the search have the same number of tokens, and two distinct
+states with equal sums never dominate each other. So the cache stores
+larger feasible states, obtained by extending the independent sets found
+by the solver greedily, and smaller infeasible states, obtained by
+removing tokens from an infeasible state while it stays infeasible.
+
+The cache also keeps an independent set for every maximal feasible state.
+Abstract states next to each other in the search only differ in a few
+tokens, so the independent set of a state usually repairs into one of its
+successors, which certifies the successor without calling the solver.
+If the repair fails, the solver is warm-started from the partial repair.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+def dominates(a, b):
+    return all(x >= y for x, y in zip(a, b))
+
+
+class Antichain(object):
+    """
+    Set of pairwise incomparable vectors, sorted by the sum of their
+    entries. With maximal=True, it represents all vectors dominated by one
+    of its elements, otherwise all vectors that dominate one of them. Only
+    elements with a larger (or smaller) sum than a query can dominate it
+    (or be dominated by it), so queries only scan that part of the list.
+    """
+    def __init__(self, maximal):
+        self.maximal = maximal
+        self.sums = []
+        self.vectors = []
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _candidates(self, total):
+        # Elements that could contain a vector with the given sum.
+        if self.maximal:
+            return range(bisect_left(self.sums, total), len(self.vectors))
+        return range(bisect_right(self.sums, total))
+
+    def find(self, vector):
+        """
+        Return an element that contains the vector or None.
+        """
+        total = sum(vector)
+        for i in self._candidates(total):
+            if self.maximal and dominates(self.vectors[i], vector):
+                return self.vectors[i]
+            if not self.maximal and dominates(vector, self.vectors[i]):
+                return self.vectors[i]
+        return None
+
+    def contains(self, vector):
+        return self.find(vector) is not None
+
+    def add(self, vector):
+        """
+        Add the vector unless it is already contained and return the list
+        of elements that it replaces, or None if it was not added.
+        """
+        if self.contains(vector):
+            return None
+        total = sum(vector)
+        # Drop the elements the new vector makes redundant.
+        if self.maximal:
+            redundant = [i for i in range(bisect_right(self.sums, total))
+                         if dominates(vector, self.vectors[i])]
+        else:
+            redundant = [i for i in range(bisect_left(self.sums, total), len(self.vectors))
+                         if dominates(self.vectors[i], vector)]
+        removed = [self.vectors[i] for i in redundant]
+        for i in reversed(redundant):
+            del self.sums[i]
+            del self.vectors[i]
+        i = bisect_right(self.sums, total)
+        self.sums.insert(i, total)
+        self.vectors.insert(i, tuple(vector))
+        return removed
+
+
+def get_counts(nodes, coloring, num_colors):
+    counts = [0] * num_colors
+    for v in nodes:
+        counts[coloring[v]] += 1
+    return counts
+
+
+def repair_independent_set(graph, coloring, nodes_by_color, nodes, abstract_state):
+    """
+    Turn the independent set into one with the counts of the abstract state
+    by greedy local changes. First remove surplus nodes, preferring those
+    that block nodes of missing colours, then add nodes of missing colours
+    that have no neighbour in the set, fewest free neighbours first.
+    Return the new set and whether it has the right counts. Otherwise the
+    set is a partial solution with at most the required counts.
+    """
+    nodes = set(nodes)
+    counts = get_counts(nodes, coloring, len(abstract_state))
+    missing = [c for c, n in enumerate(abstract_state) if counts[c] < n]
+    candidates = [v for c in missing for v in nodes_by_color.get(c, []) if v not in nodes]
+    if any(counts[c] > n for c, n in enumerate(abstract_state)):
+        # Count the candidates that only one node of the set blocks.
+        freed_by = {}
+        for v in candidates:
+            blocking = [u for u in graph[v] if u in nodes]
+            if len(blocking) == 1:
+                freed_by[blocking[0]] = freed_by.get(blocking[0], 0) + 1
+        for u in sorted(nodes, key=lambda u: -freed_by.get(u, 0)):
+            color = coloring[u]
+            if counts[color] > abstract_state[color]:
+                nodes.remove(u)
+                counts[color] -= 1
+    free = set(v for v in candidates if not any(u in nodes for u in graph[v]))
+    # Static min-degree order, updating it after every choice costs too much.
+    free_degree = {v: sum(1 for u in graph[v] if u in free) for v in free}
+    for v in sorted(free, key=lambda v: (free_degree[v], v)):
+        color = coloring[v]
+        if v in free and counts[color] < abstract_state[color]:
+            nodes.add(v)
+            counts[color] += 1
+            free.difference_update(graph[v])
+    return nodes, counts == list(abstract_state)
+
+
+def shrink_infeasible_state(abstract_state, is_feasible):
+    """
+    Remove tokens from the infeasible state colour by colour as long as
+    it stays infeasible and return the smaller state.
+    """
+    core = list(abstract_state)
+    for color in range(len(core)):
+        while core[color] > 0:
+            core[color] -= 1
+            if is_feasible(tuple(core)):
+                core[color] += 1
+                break
+    return tuple(core)
+
+
+class FeasibilityCache(object):
+    """
+    Answer feasibility queries for abstract states from the cache where
+    possible and with solve(abstract_state, start) otherwise. solve
+    returns a pair (feasible, nodes) like satisfiable.find_independent_set
+    and is warm-started from the independent set start if it is not None.
+    """
+    def __init__(self, graph, coloring, solve, shrink_cores=True):
+        self.graph = graph
+        self.coloring = coloring
+        self.num_colors = max(coloring) + 1
+        self.nodes_by_color = {}
+        for v, color in enumerate(coloring):
+            self.nodes_by_color.setdefault(color, []).append(v)
+        self.solve = solve
+        self.shrink_cores = shrink_cores
+        self.feasible = Antichain(maximal=True)
+        self.infeasible = Antichain(maximal=False)
+        # Independent set for every element of self.feasible that has one.
+        self.witnesses = {}
+        self.num_queries = 0
+        self.num_feasible_hits = 0
+        self.num_infeasible_hits = 0
+        self.num_repairs = 0
+        self.num_solver_calls = 0
+        self.num_warm_starts = 0
+
+    def lookup(self, abstract_state):
+        """
+        Return True or False if the cache decides the state, None otherwise.
+        """
+        if self.feasible.contains(abstract_state):
+            return True
+        if self.infeasible.contains(abstract_state):
+            return False
+        return None
+
+    def is_feasible(self, abstract_state):
+        return self.find_witness(abstract_state)[0]
+
+    def find_witness(self, abstract_state, hint=None):
+        """
+        Return a pair (feasible, nodes) where nodes is an independent set
+        with the counts of the abstract state if one is known. The
+        independent set hint, e.g., of a neighbouring state, is repaired
+        into a witness before calling the solver.
+        """
+        feasible, nodes, start = self.answer(abstract_state, hint)
+        if feasible is not None:
+            return feasible, nodes
+        feasible, nodes = self._solve(abstract_state, start)
+        if not feasible and self.shrink_cores:
+            self.infeasible.add(self._shrink(abstract_state))
+        return feasible, nodes
+
+    def answer(self, abstract_state, hint=None):
+        """
+        Like find_witness, but never call the solver. Return a triple
+        (feasible, nodes, start) with feasible None if the solver is needed,
+        and start the partially repaired hint to warm-start it with.
+        """
+        self.num_queries += 1
+        dominating = self.feasible.find(abstract_state)
+        if dominating is not None:
+            self.num_feasible_hits += 1
+            witness = self.witnesses.get(dominating)
+            if witness is not None:
+                witness, _ = repair_independent_set(self.graph, self.coloring, self.nodes_by_color, witness, abstract_state)
+            return True, witness, None
+        if self.infeasible.contains(abstract_state):
+            self.num_infeasible_hits += 1
+            return False, None, None
+        start = None
+        if hint is not None:
+            start, complete = repair_independent_set(self.graph, self.coloring, self.nodes_by_color, hint, abstract_state)
+            if complete:
+                self.num_repairs += 1
+                self._add_feasible(start)
+                return True, start, None
+        return None, None, start
+
+    def record(self, abstract_state, feasible, nodes, core=None, num_solver_calls=1, warm_started=False):
+        """
+        Store a result computed outside of the cache, e.g., by another
+        process, together with the infeasible core of infeasible states.
+        """
+        self.num_solver_calls += num_solver_calls
+        self.num_warm_starts += warm_started
+        self._add_result(abstract_state, feasible, nodes)
+        if core is not None:
+            self.infeasible.add(core)
+
+    @property
+    def num_hits(self):
+        return self.num_feasible_hits + self.num_infeasible_hits + self.num_repairs
+
+    def hit_rate(self):
+        return self.num_hits / self.num_queries if self.num_queries else 0.0
+
+    def _solve(self, abstract_state, start=None):
+        self.num_solver_calls += 1
+        if start:
+            self.num_warm_starts += 1
+        feasible, nodes = self.solve(abstract_state, start)
+        self._add_result(abstract_state, feasible, nodes)
+        return feasible, nodes
+
+    def _add_result(self, abstract_state, feasible, nodes):
+        if not feasible:
+            self.infeasible.add(abstract_state)
+        elif nodes is not None:
+            self._add_feasible(nodes)
+        else:
+            self.feasible.add(abstract_state)
+
+    def _add_feasible(self, nodes):
+        extended = self._extend(nodes)
+        counts = tuple(get_counts(extended, self.coloring, self.num_colors))
+        removed = self.feasible.add(counts)
+        if removed is not None:
+            for vector in removed:
+                self.witnesses.pop(vector, None)
+            self.witnesses[counts] = extended
+
+    def _extend(self, nodes):
+        """
+        Extend the independent set greedily to a maximal one.
+        """
+        extended = list(nodes)
+        blocked = set(nodes)
+        for v in nodes:
+            blocked.update(self.graph[v])
+        for v in self.graph:
+            if v not in blocked:
+                extended.append(v)
+                blocked.add(v)
+                blocked.update(self.graph[v])
+        return extended
+
+    def _shrink(self, abstract_state):
+        def is_feasible(smaller):
+            result = self.lookup(smaller)
+            if result is None:
+                result, _ = self._solve(smaller)
+            return result
+        return shrink_infeasible_state(abstract_state, is_feasible)
+
+    def print_statistics(self):
+        print(f"Feasibility queries: {self.num_queries}")
+        print(f"Cache hits: {self.num_hits} ({100 * self.hit_rate():0.1f}%; "
+              f"{self.num_feasible_hits} feasible, {self.num_infeasible_hits} infeasible, "
+              f"{self.num_repairs} repaired)")
+        print(f"Solver calls: {self.num_solver_calls} ({self.num_warm_starts} warm-started)")
+        print(f"Cached states: {len(self.feasible)} maximal feasible, "
+              f"{len(self.infeasible)} minimal infeasible")
@@ -0,0 +1,150 @@
+"""
+Counterexample-guided refinement of the colouring of a counter abstraction.
+
+Every colouring of the nodes gives a sound abstraction, so an abstract
+path that has no concrete counterpart only shows that the colouring is too
+coarse. concretize_path looks for a concrete plan that follows the
+abstract path, by a bounded depth-first search over the token sets with
+the counts of the abstract states. If it fails, it returns the colours of
+the step where it got stuck, and refine_coloring splits these colour
+classes: by Weisfeiler-Leman refinement (the colours of the neighbours)
+first, and by the distances to the start and goal tokens or the degree
+if that does not separate any nodes. If none of these classes can be
+split, it splits other classes. Every split adds one colour, so the
+abstraction grows slowly.
+"""
+
+from collections import Counter
+import time
+
+# Concrete states the search for a concrete path may expand.
+MAX_CONCRETIZATION_STEPS = 100000
+# The number of abstract states grows quickly with the colours.
+MAX_COLORS = 12
+
+
+def get_changed_colors(state, next_state):
+    source = next(c for c, (a, b) in enumerate(zip(state, next_state)) if b < a)
+    target = next(c for c, (a, b) in enumerate(zip(state, next_state)) if b > a)
+    return source, target
+
+
+def concretize_path(graph, start, goal, coloring, path, max_steps=MAX_CONCRETIZATION_STEPS, deadline=None):
+    """
+    Return a pair (moves, failed_colors). If a concrete plan follows the
+    abstract path, moves lists its jumps (from_node, to_node). Otherwise
+    moves is None and failed_colors are the colours of the deepest step
+    the search could not realize.
+    """
+    steps = [get_changed_colors(a, b) for a, b in zip(path, path[1:])]
+    nodes_by_color = {}
+    for v, color in enumerate(coloring):
+        nodes_by_color.setdefault(color, []).append(v)
+    goal = frozenset(goal)
+    stack = [(0, frozenset(start), [])]
+    visited = set()
+    deepest = -1
+    failed_colors = set()
+    num_steps = 0
+    while stack:
+        i, state, moves = stack.pop()
+        if i == len(steps):
+            if state == goal:
+                return moves, None
+            if deepest < i:
+                deepest = i
+                failed_colors = set()
+            if deepest == i:
+                failed_colors.update(coloring[v] for v in state ^ goal)
+            continue
+        if (i, state) in visited:
+            continue
+        visited.add((i, state))
+        num_steps += 1
+        if num_steps > max_steps or (deadline is not None and time.monotonic() > deadline):
+            break
+        if deepest < i:
+            deepest = i
+            failed_colors = set(steps[i])
+        source, target = steps[i]
+        successors = []
+        for v in nodes_by_color[target]:
+            if v in state:
+                continue
+            # v may only be next to the token that jumps to it.
+            tokens = [u for u in graph[v] if u in state]
+            if not tokens:
+                jumps = [u for u in state if coloring[u] == source]
+            elif len(tokens) == 1 and coloring[tokens[0]] == source:
+                jumps = tokens
+            else:
+                jumps = []
+            for u in jumps:
+                successors.append((u, v))
+        # Try jumps from outside the goal to the goal first.
+        successors.sort(key=lambda move: (move[0] not in goal) + (move[1] in goal))
+        for u, v in successors:
+            stack.append((i + 1, state - {u} | {v}, moves + [(u, v)]))
+    return None, failed_colors
+
+
+def get_distances(graph, sources):
+    distances = [None] * graph.num_nodes
+    queue = list(sources)
+    for v in queue:
+        distances[v] = 0
+    for v in queue:
+        for u in graph[v]:
+            if distances[u] is None:
+                distances[u] = distances[v] + 1
+                queue.append(u)
+    return distances
+
+
+def split_classes(coloring, colors, keys):
+    """
+    Split every class in colors into the nodes with its most common key and
+    the rest. Return the new colouring, or None if no class was split.
+    """
+    new_coloring = list(coloring)
+    next_color = max(coloring) + 1
+    for color in sorted(colors):
+        members = [v for v, c in enumerate(coloring) if c == color]
+        counts = Counter(keys[v] for v in members)
+        if len(counts) < 2:
+            continue
+        most_common = counts.most_common(1)[0][0]
+        for v in members:
+            if keys[v] != most_common:
+                new_coloring[v] = next_color
+        next_color += 1
+    if next_color == max(coloring) + 1:
+        return None
+    return new_coloring
+
+
+def refine_coloring(graph, start, goal, coloring, failed_colors, max_colors=MAX_COLORS):
+    """
+    Return a finer colouring that splits some of the failed colour classes
+    (or other classes if these cannot be split), or None if no class can be
+    split or the colouring would get too large.
+    """
+    num_colors = max(coloring) + 1
+    start_distances = get_distances(graph, start)
+    goal_distances = get_distances(graph, goal)
+    strategies = [
+        lambda v: tuple(sorted(coloring[u] for u in graph[v])),
+        lambda v: (start_distances[v], goal_distances[v]),
+        lambda v: graph.degree(v),
+    ]
+    # Other classes are tried one at a time, to keep the abstraction small.
+    candidates = [sorted(failed_colors)] + [[c] for c in range(num_colors) if c not in failed_colors]
+    for colors in candidates:
+        # Split at most as many classes as there is room for new colours.
+        colors = colors[:max_colors - num_colors]
+        for key in strategies:
+            keys = [key(v) for v in range(graph.num_nodes)]
+            new_coloring = split_classes(coloring, colors, keys)
+            if new_coloring is not None:
+                return new_coloring
+    return None
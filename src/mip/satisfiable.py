@@ -1,45 +1,89 @@
+from bitset_oracle import BitsetOracle
+
+# Without CPLEX and SCIP, only the "BB" technique is available.
+has_cplex = False
+has_scip = False
 try:
     from docplex.mp.model import Model
+    from docplex.mp.constants import EffortLevel
+    from docplex.mp.solution import SolveSolution
     from docplex.cp.model import CpoModel
     from docplex.cp.expression import integer_var_list
     has_cplex = True
 except:
-    from pyscipopt import Model
-    has_cplex = False
+    try:
+        from pyscipopt import Model
+        has_scip = True
+    except:
+        pass
+has_mip = has_cplex or has_scip
 
 
 def compute_color_to_indices(coloring):
     colors = set(coloring)
     return {c: [p for p, cp in enumerate(coloring) if cp == c] for c in colors}
 
-def build_model(edges, coloring, technique="LP"):
-    if technique == "CP":
+def build_model(graph, coloring, technique="LP"):
+    if technique == "BB":
+        return BitsetModel(graph, coloring)
+    elif technique == "CP":
         # CP model cannot be iteratively updated and will be recreated for each solve.
         return None
     elif technique == "LP":
         if has_cplex:
-            return build_model_cplex(edges, coloring)
+            return build_model_cplex(graph, coloring)
         else:
-            # I did not manage to make it work with reusing the model for
-            # different states, so the model is being rebuilt every time.
-            return None
+            return ScipModel(graph, coloring)
     else:
         print(f"Unknown modelling technique '{technique}'")
 
-def is_state_valid(m, edges, coloring, abstract_state, technique="LP"):
-    if technique == "CP":
-        return is_state_valid_cp(m, edges, coloring, abstract_state)
+def is_state_valid(m, graph, coloring, abstract_state, technique="LP"):
+    return find_independent_set(m, graph, coloring, abstract_state, technique)[0]
+
+# Returns a pair (feasible, nodes). If the state is feasible, nodes is an
+# independent set with the counts of the abstract state, or None if the
+# solver stopped without a solution. States the solver could not decide
+# count as feasible, so the search never prunes a valid state.
+# The LP models are warm-started from the nodes in start, an independent
+# set that may be smaller than the abstract state requires.
+def find_independent_set(m, graph, coloring, abstract_state, technique="LP", start=None):
+    if technique == "BB":
+        return find_independent_set_bitset(m, graph, coloring, abstract_state, start)
+    elif technique == "CP":
+        return find_independent_set_cp(m, graph, coloring, abstract_state)
     elif technique == "LP":
         if has_cplex:
-            return is_state_valid_cplex(m, edges, coloring, abstract_state)
+            return find_independent_set_cplex(m, graph, coloring, abstract_state, start)
         else:
-            return is_state_valid_scip(m, edges, coloring, abstract_state)
+            return find_independent_set_scip(m, graph, coloring, abstract_state, start)
     else:
         print(f"Unknown modelling technique '{technique}'")
 
+# Branch and bound ---------------------------------------------------------------
+
+class BitsetModel(object):
+    """
+    Bitset oracle with an LP model for the states it cannot decide within
+    its step limit. The LP model is only built when it is needed.
+    """
+    def __init__(self, graph, coloring):
+        self.oracle = BitsetOracle(graph, coloring)
+        self.fallback = None
+
+
+def find_independent_set_bitset(m, graph, coloring, abstract_state, start=None):
+    feasible, nodes = m.oracle.find_independent_set(abstract_state)
+    if feasible is not None:
+        return feasible, nodes
+    if not has_mip:
+        return True, None
+    if m.fallback is None:
+        m.fallback = build_model(graph, coloring)
+    return find_independent_set(m.fallback, graph, coloring, abstract_state, start=start)
+
 # CP ---------------------------------------------------------------------------
 
-def build_model_cp(edges, coloring, abstract_state):
+def build_model_cp(graph, coloring, abstract_state):
     num_nodes = len(coloring)
     m = CpoModel()
     x = m.integer_var_list(num_nodes, 0, 1)
@@ -48,20 +92,24 @@ def build_model_cp(edges, coloring, abstract_state):
     for color, indices in color_dict.items():
         m.add_constraint(sum(x[i] for i in indices) == abstract_state[color])
 
-    for i, j in edges:
+    for i, j in graph.edges():
         m.add_constraint(x[i] + x[j] <= 1)
 
-    return m
+    return m, x
 
 
-def is_state_valid_cp(m, edges, coloring, abstract_state):
-    m = build_model_cp(edges, coloring, abstract_state)
-    result = m.solve(log_output=None).get_solve_status()
-    return result != "Infeasible"
+def find_independent_set_cp(m, graph, coloring, abstract_state):
+    m, x = build_model_cp(graph, coloring, abstract_state)
+    result = m.solve(log_output=None)
+    if result.get_solve_status() == "Infeasible":
+        return False, None
+    if not result:
+        return True, None
+    return True, [i for i in range(len(coloring)) if result.get_value(x[i]) > 0]
 
 # CPLEX ------------------------------------------------------------------------
 
-def build_model_cplex(edges, coloring):
+def build_model_cplex(graph, coloring):
     num_nodes = len(coloring)
     m = Model()
     m.set_objective("min", 0)
@@ -71,44 +119,89 @@ def build_model_cplex(edges, coloring):
     for color, indices in color_dict.items():
         m.add_constraint(sum(x[i] for i in indices) == 0)
 
-    for i, j in edges:
+    for i, j in graph.edges():
         m.add_constraint(x[i] + x[j] <= 1)
 
     return m
 
 
-def is_state_valid_cplex(m, edges, coloring, abstract_state):
+def find_independent_set_cplex(m, graph, coloring, abstract_state, start=None):
     for color in set(coloring):
         m.get_constraint_by_index(color).rhs = abstract_state[color]
-    m.solve(log_output=False)
-    return m.solve_details.status != "integer infeasible"
+    m.clear_mip_starts()
+    if start:
+        # A partial start, CPLEX tries to repair it into a solution.
+        m.add_mip_start(SolveSolution(m, {m.get_var_by_index(i): 1 for i in start}),
+                        effort_level=EffortLevel.Repair)
+    solution = m.solve(log_output=False)
+    if m.solve_details.status == "integer infeasible":
+        return False, None
+    if solution is None:
+        return True, None
+    # The node variables were created first, so their indices are the nodes.
+    return True, [i for i in range(len(coloring))
+                  if solution.get_value(m.get_var_by_index(i)) > 0.5]
 
 # SCIP -------------------------------------------------------------------------
 
-def build_model_scip(edges, coloring):
+# Returns the model together with its node variables and the count
+# constraint of every colour, which are updated for every state.
+def build_model_scip(graph, coloring):
     num_nodes = len(coloring)
     m = Model()
     m.setObjective(0, "minimize")
+    m.hideOutput()
     con_vars = []
     for i in range(num_nodes):
         con_vars.append(m.addVar(vtype="B"))
 
     color_dict = compute_color_to_indices(coloring)
+    color_constraints = {}
     for color, indices in color_dict.items():
-        m.addCons(sum(con_vars[i] for i in indices) == 0)
+        color_constraints[color] = m.addCons(sum(con_vars[i] for i in indices) == 0)
 
-    for i, j in edges:
+    for i, j in graph.edges():
         m.addCons(con_vars[i] + con_vars[j] <= 1)
 
-    return m
-
-
-def is_state_valid_scip(m, edges, coloring, abstract_state):
-    m = build_model_scip(edges, coloring)
-    constraints = m.getConss()
-    for color in set(coloring):
-        m.chgRhs(constraints[color], abstract_state[color])
-        m.chgLhs(constraints[color], abstract_state[color])
-    m.hideOutput()
+    return m, con_vars, color_constraints
+
+
+class ScipModel(object):
+    """
+    SCIP model that is kept for all states. SCIP keeps the partial
+    solutions of earlier solves and stores at most limits/maxorigsol of
+    them, so the model is rebuilt after that many warm starts.
+    """
+    def __init__(self, graph, coloring):
+        self.graph = graph
+        self.coloring = coloring
+        self.build()
+
+    def build(self):
+        self.m, self.con_vars, self.color_constraints = build_model_scip(self.graph, self.coloring)
+        self.max_partial_solutions = self.m.getParam("limits/maxorigsol")
+        self.num_partial_solutions = 0
+
+
+def find_independent_set_scip(model, graph, coloring, abstract_state, start=None):
+    if start and model.num_partial_solutions == model.max_partial_solutions:
+        model.build()
+    m, con_vars = model.m, model.con_vars
+    # Go back to the problem stage, so the constraints can be changed.
+    m.freeTransform()
+    for color, constraint in model.color_constraints.items():
+        m.chgRhs(constraint, abstract_state[color])
+        m.chgLhs(constraint, abstract_state[color])
+    if start:
+        # SCIP completes partial solutions before the search.
+        solution = m.createPartialSol()
+        for i in start:
+            m.setSolVal(solution, con_vars[i], 1)
+        m.addSol(solution)
+        model.num_partial_solutions += 1
     m.optimize()
-    return m.getStatus() != "infeasible"
+    if m.getStatus() == "infeasible":
+        return False, None
+    if m.getNSols() == 0:
+        return True, None
+    return True, [i for i, var in enumerate(con_vars) if m.getVal(var) > 0.5]
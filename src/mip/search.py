@@ -1,27 +1,82 @@
-from satisfiable import build_model, is_state_valid
+from feasibility_cache import FeasibilityCache, shrink_infeasible_state
+from satisfiable import build_model, find_independent_set
+import multiprocessing
 import time
 
+# With several workers, the search expands this many states per worker
+# before it waits for the feasibility checks of their successors.
+STATES_PER_WORKER = 4
+
+# Model of a worker process, see _init_worker.
+_worker = None
+
+
+def _init_worker(graph, coloring, technique, shrink_cores):
+    global _worker
+    _worker = (graph, coloring, technique, shrink_cores, build_model(graph, coloring, technique))
+
+
+def _solve_in_worker(task):
+    """
+    Check the feasibility of an abstract state in a worker process and
+    return (feasible, nodes, core, num_solver_calls) for
+    FeasibilityCache.record.
+    """
+    abstract_state, start = task
+    graph, coloring, technique, shrink_cores, model = _worker
+    num_solver_calls = 1
+    feasible, nodes = find_independent_set(model, graph, coloring, abstract_state, technique, start)
+    core = None
+    if not feasible and shrink_cores:
+        def is_feasible(smaller):
+            nonlocal num_solver_calls
+            num_solver_calls += 1
+            return find_independent_set(model, graph, coloring, smaller, technique)[0]
+        core = shrink_infeasible_state(abstract_state, is_feasible)
+    return feasible, nodes, core, num_solver_calls
+
+
 class DepthFirstSearch(object):
-    def __init__(self, edges, coloring):
-        self.edges = edges
+    def __init__(self, graph, coloring, technique="LP", num_workers=1):
+        self.graph = graph
         self.coloring = coloring
-        self.model = build_model(edges, coloring)
+        self.technique = technique
+        self.num_workers = num_workers
+        # Only built if the search checks states in the main process.
+        self.model = None
+        self.cache = FeasibilityCache(graph, coloring, self._find_independent_set)
 
     def _reset(self):
         self.queue = []
         self.closed = set()
+        # Parent of every generated state, to return the abstract path.
+        self.parents = {}
+        # Independent sets of the queued states, to repair into witnesses
+        # for their successors.
+        self.witnesses = {}
         self.report_granularity = 1
         self.report_next = 1
         self.num_expanded = 0
         self.num_evaluated = 0
         self.started = time.time()
 
-    def _push(self, s):
+    def _push(self, s, witness=None, parent=None):
         self.queue.append(s)
         self.closed.add(s)
+        self.parents[s] = parent
+        if witness is not None:
+            self.witnesses[s] = witness
+
+    def _extract_path(self, s):
+        path = [s]
+        while self.parents[path[-1]] is not None:
+            path.append(self.parents[path[-1]])
+        path.reverse()
+        return path
 
     def _pop(self):
-        return self.queue.pop()
+        s = self.queue.pop()
+        return s, self.witnesses.pop(s, None)
 
     def _get_successors(self, s):
         variables = range(len(s))
@@ -34,9 +89,14 @@ class DepthFirstSearch(object):
                     yield tuple(succ)
 
 
-    def _is_state_valid(self, s):
+    def _find_independent_set(self, s, start=None):
+        if self.model is None:
+            self.model = build_model(self.graph, self.coloring, self.technique)
+        return find_independent_set(self.model, self.graph, self.coloring, s, self.technique, start)
+
+    def _find_witness(self, s, hint):
         self.num_evaluated += 1
-        return is_state_valid(self.model, self.edges, self.coloring, s)
+        return self.cache.find_witness(s, hint)
 
     def _report(self):
         self.num_expanded += 1
@@ -50,24 +110,78 @@ class DepthFirstSearch(object):
             print(f"[{elapsed:0.2f}] "
                   f"Expanded {self.num_expanded} states; "
                   f"Evaluated {self.num_evaluated} states "
-                  f"({states_per_second:0.2f} per second)")
+                  f"({states_per_second:0.2f} per second); "
+                  f"Cache hits {100 * self.cache.hit_rate():0.1f}%")
 
     def _print_statistics(self):
         print(f"Total time: {time.time() - self.started:0.2f}")
         print(f"Expanded: {self.num_expanded}")
+        self.cache.print_statistics()
 
 
     def run(self, initial_state, goal_state):
+        """
+        Return an abstract path from the initial to the goal state as a
+        list of abstract states, or None if there is none.
+        """
+        if self.num_workers > 1:
+            return self._run_batched(initial_state, goal_state)
         self._reset()
         self._push(initial_state)
         while self.queue:
-            s = self._pop()
+            s, witness = self._pop()
             self._report()
             for succ in self._get_successors(s):
-                if succ not in self.closed and self._is_state_valid(succ):
+                if succ in self.closed:
+                    continue
+                valid, succ_witness = self._find_witness(succ, witness)
+                if valid:
+                    self._push(succ, succ_witness, s)
                     if succ == goal_state:
                         self._print_statistics()
-                        return True
-                    self._push(succ)
+                        return self._extract_path(succ)
+        self._print_statistics()
+        return None
+
+    def _run_batched(self, initial_state, goal_state):
+        """
+        Like run, but expand a batch of states at a time and check the
+        successors the cache cannot answer in parallel, with one model per
+        worker process. The answers only depend on the states, so the
+        search proves the same instances unsolvable as run.
+        """
+        self._reset()
+        self._push(initial_state)
+        batch_size = STATES_PER_WORKER * self.num_workers
+        with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(
+                self.graph, self.coloring, self.technique, self.cache.shrink_cores)) as pool:
+            while self.queue:
+                # Successors with the witness of their parent, without duplicates.
+                hints = {}
+                for _ in range(min(batch_size, len(self.queue))):
+                    s, witness = self._pop()
+                    self._report()
+                    for succ in self._get_successors(s):
+                        if succ not in self.closed and succ not in hints:
+                            hints[succ] = (s, witness)
+                tasks = []
+                for succ, (parent, hint) in hints.items():
+                    self.num_evaluated += 1
+                    valid, succ_witness, start = self.cache.answer(succ, hint)
+                    if valid is None:
+                        tasks.append((succ, start))
+                    elif valid:
+                        self._push(succ, succ_witness, parent)
+                        if succ == goal_state:
+                            self._print_statistics()
+                            return self._extract_path(succ)
+                for (succ, start), result in zip(tasks, pool.imap(_solve_in_worker, tasks)):
+                    valid, succ_witness, core, num_solver_calls = result
+                    self.cache.record(succ, valid, succ_witness, core, num_solver_calls, bool(start))
+                    if valid:
+                        self._push(succ, succ_witness, hints[succ][0])
+                        if succ == goal_state:
+                            self._print_statistics()
+                            return self._extract_path(succ)
         self._print_statistics()
-        return False
+        return None
@@ -6,10 +6,13 @@
 #include "../plugin.h"
 
 #include "../utils/memory.h"
+#include "../utils/rng.h"
+#include "../utils/rng_options.h"
 
 #include <cassert>
 #include <deque>
 #include <map>
+#include <utility>
 
 using namespace std;
 
@@ -22,6 +25,8 @@ class BestFirstOpenList : public OpenList<Entry> {
     int size;
 
     shared_ptr<Evaluator> evaluator;
+    bool random_tiebreaking;
+    shared_ptr<utils::RandomNumberGenerator> rng;
 
 protected:
     virtual void do_insertion(EvaluationContext &eval_context,
@@ -47,7 +52,9 @@ template<class Entry>
 BestFirstOpenList<Entry>::BestFirstOpenList(const Options &opts)
     : OpenList<Entry>(opts.get<bool>("pref_only")),
       size(0),
-      evaluator(opts.get<shared_ptr<Evaluator>>("eval")) {
+      evaluator(opts.get<shared_ptr<Evaluator>>("eval")),
+      random_tiebreaking(opts.get<bool>("random_tiebreaking")),
+      rng(random_tiebreaking ? utils::parse_rng_from_options(opts) : nullptr) {
 }
 
 template<class Entry>
@@ -55,7 +62,8 @@ BestFirstOpenList<Entry>::BestFirstOpenList(
     const shared_ptr<Evaluator> &evaluator, bool preferred_only)
     : OpenList<Entry>(preferred_only),
       size(0),
-      evaluator(evaluator) {
+      evaluator(evaluator),
+      random_tiebreaking(false) {
 }
 
 template<class Entry>
@@ -73,6 +81,9 @@ Entry BestFirstOpenList<Entry>::remove_min() {
     assert(it != buckets.end());
     Bucket &bucket = it->second;
     assert(!bucket.empty());
+    if (random_tiebreaking && bucket.size() > 1) {
+        swap(bucket.front(), bucket[rng->random(bucket.size())]);
+    }
     Entry result = bucket.front();
     bucket.pop_front();
     if (bucket.empty())
@@ -128,7 +139,7 @@ BestFirstOpenListFactory::create_edge_open_list() {
 static shared_ptr<OpenListFactory> _parse(OptionParser &parser) {
     parser.document_synopsis(
         "Best-first open list",
-        "Open list that uses a single evaluator and FIFO tiebreaking.");
+        "Open list that uses a single evaluator and FIFO or random tiebreaking.");
     parser.document_note(
         "Implementation Notes",
         "Elements with the same evaluator value are stored in double-ended "
@@ -140,6 +151,12 @@ static shared_ptr<OpenListFactory> _parse(OptionParser &parser) {
     parser.add_option<bool>(
         "pref_only",
         "insert only nodes generated by preferred operators", "false");
+    parser.add_option<bool>(
+        "random_tiebreaking",
+        "remove a random entry among those with the lowest value instead of "
+        "the oldest one",
+        "false");
+    utils::add_rng_options(parser);
 
     Options opts = parser.parse();
     if (parser.dry_run())
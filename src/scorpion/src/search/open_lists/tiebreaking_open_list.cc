@@ -6,6 +6,8 @@
 #include "../plugin.h"
 
 #include "../utils/memory.h"
+#include "../utils/rng.h"
+#include "../utils/rng_options.h"
 
 #include <cassert>
 #include <deque>
@@ -30,6 +32,8 @@ class TieBreakingOpenList : public OpenList<Entry> {
       not a safe heuristic.
     */
     bool allow_unsafe_pruning;
+    bool random_tiebreaking;
+    shared_ptr<utils::RandomNumberGenerator> rng;
 
     int dimension() const;
 
@@ -56,7 +60,9 @@ template<class Entry>
 TieBreakingOpenList<Entry>::TieBreakingOpenList(const Options &opts)
     : OpenList<Entry>(opts.get<bool>("pref_only")),
       size(0), evaluators(opts.get_list<shared_ptr<Evaluator>>("evals")),
-      allow_unsafe_pruning(opts.get<bool>("unsafe_pruning")) {
+      allow_unsafe_pruning(opts.get<bool>("unsafe_pruning")),
+      random_tiebreaking(opts.get<bool>("random_tiebreaking")),
+      rng(random_tiebreaking ? utils::parse_rng_from_options(opts) : nullptr) {
 }
 
 template<class Entry>
@@ -79,6 +85,9 @@ Entry TieBreakingOpenList<Entry>::remove_min() {
     assert(it != buckets.end());
     assert(!it->second.empty());
     --size;
+    if (random_tiebreaking && it->second.size() > 1) {
+        swap(it->second.front(), it->second[rng->random(it->second.size())]);
+    }
     Entry result = it->second.front();
     it->second.pop_front();
     if (it->second.empty())
@@ -162,6 +171,12 @@ static shared_ptr<OpenListFactory> _parse(OptionParser &parser) {
         "unsafe_pruning",
         "allow unsafe pruning when the main evaluator regards a state a dead end",
         "true");
+    parser.add_option<bool>(
+        "random_tiebreaking",
+        "remove a random entry among those with the lowest values of all "
+        "evaluators instead of the oldest one",
+        "false");
+    utils::add_rng_options(parser);
     Options opts = parser.parse();
     opts.verify_list_non_empty<shared_ptr<Evaluator>>("evals");
     if (parser.dry_run())
@@ -88,6 +88,9 @@ void SearchEngine::search() {
     utils::CountdownTimer timer(max_time);
     while (status == IN_PROGRESS) {
         status = step();
+        if (statistics.is_progress_report_due()) {
+            statistics.report_progress(state_registry.size());
+        }
         if (timer.is_expired()) {
             log << "Time limit reached. Abort search." << endl;
             status = TIMEOUT;
@@ -70,6 +70,12 @@ public:
     const SearchStatistics &get_statistics() const {return statistics;}
     void set_bound(int b) {bound = b;}
     int get_bound() {return bound;}
+    /*
+      Return true if the search reopens closed nodes when it finds cheaper
+      paths to them. Only then does exhausting the states below the bound
+      prove that no cheaper plan exists.
+    */
+    virtual bool reopens_closed_nodes() const {return false;}
     PlanManager &get_plan_manager() {return plan_manager;}
 
     /* The following three methods should become functions as they
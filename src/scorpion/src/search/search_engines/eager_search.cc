@@ -10,6 +10,8 @@
 #include "../task_utils/successor_generator.h"
 
 #include "../utils/logging.h"
+#include "../utils/rng.h"
+#include "../utils/rng_options.h"
 
 #include <cassert>
 #include <cstdlib>
@@ -28,7 +30,9 @@ EagerSearch::EagerSearch(const Options &opts)
       f_evaluator(opts.get<shared_ptr<Evaluator>>("f_eval", nullptr)),
       preferred_operator_evaluators(opts.get_list<shared_ptr<Evaluator>>("preferred")),
       lazy_evaluator(opts.get<shared_ptr<Evaluator>>("lazy_evaluator", nullptr)),
-      pruning_method(opts.get<shared_ptr<PruningMethod>>("pruning")) {
+      pruning_method(opts.get<shared_ptr<PruningMethod>>("pruning")),
+      randomize_successors(opts.get<bool>("randomize_successors")),
+      rng(utils::parse_rng_from_options(opts)) {
     if (lazy_evaluator && !lazy_evaluator->does_cache_estimates()) {
         cerr << "lazy_evaluator must cache its estimates" << endl;
         utils::exit_with(utils::ExitCode::SEARCH_INPUT_ERROR);
@@ -181,6 +185,10 @@ SearchStatus EagerSearch::step() {
     */
     pruning_method->prune_operators(s, applicable_ops);
 
+    if (randomize_successors) {
+        rng->shuffle(applicable_ops);
+    }
+
     // This evaluates the expanded state (again) to get preferred ops
     EvaluationContext eval_context(s, node->get_g(), false, &statistics, true);
     ordered_set::OrderedSet<OperatorID> preferred_operators;
@@ -311,5 +319,15 @@ void EagerSearch::update_f_value_statistics(EvaluationContext &eval_context) {
 void add_options_to_parser(OptionParser &parser) {
     SearchEngine::add_pruning_option(parser);
     SearchEngine::add_options_to_parser(parser);
+    parser.add_option<bool>(
+        "randomize_successors",
+        "shuffle successors before inserting them into the open list",
+        "false");
+    parser.add_option<bool>(
+        "random_tiebreaking",
+        "break ties randomly in the open lists that eager_greedy, "
+        "eager_wastar and astar create (use the open list options for eager)",
+        "false");
+    utils::add_rng_options(parser);
 }
 }
@@ -10,6 +10,10 @@
 class Evaluator;
 class PruningMethod;
 
+namespace utils {
+class RandomNumberGenerator;
+}
+
 namespace options {
 class OptionParser;
 class Options;
@@ -28,6 +32,9 @@ class EagerSearch : public SearchEngine {
 
     std::shared_ptr<PruningMethod> pruning_method;
 
+    const bool randomize_successors;
+    std::shared_ptr<utils::RandomNumberGenerator> rng;
+
     void start_f_value_statistics(EvaluationContext &eval_context);
     void update_f_value_statistics(EvaluationContext &eval_context);
     void reward_progress();
@@ -41,6 +48,7 @@ public:
     virtual ~EagerSearch() = default;
 
     virtual void print_statistics() const override;
+    virtual bool reopens_closed_nodes() const override {return reopen_closed_nodes;}
 
     void dump_search_space() const;
 };
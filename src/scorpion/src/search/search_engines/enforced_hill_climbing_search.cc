@@ -44,6 +44,7 @@ static shared_ptr<OpenListFactory> create_ehc_open_list_factory(
         Options options;
         options.set("eval", g_evaluator);
         options.set("pref_only", false);
+        options.set("random_tiebreaking", false);
         return make_shared<standard_scalar_open_list::BestFirstOpenListFactory>(options);
     } else {
         /*
@@ -62,6 +63,7 @@ static shared_ptr<OpenListFactory> create_ehc_open_list_factory(
         options.set("evals", evals);
         options.set("pref_only", false);
         options.set("unsafe_pruning", true);
+        options.set("random_tiebreaking", false);
         return make_shared<tiebreaking_open_list::TieBreakingOpenListFactory>(options);
     }
 }
@@ -5,7 +5,9 @@
 
 #include "../utils/logging.h"
 
+#include <fstream>
 #include <iostream>
+#include <limits>
 
 using namespace std;
 
@@ -20,6 +22,7 @@ IteratedSearch::IteratedSearch(const Options &opts, options::Registry &registry,
       repeat_last_phase(opts.get<bool>("repeat_last")),
       continue_on_fail(opts.get<bool>("continue_on_fail")),
       continue_on_solve(opts.get<bool>("continue_on_solve")),
+      bound_file(opts.get<string>("bound_file", "")),
       phase(0),
       last_phase_found_solution(false),
       best_bound(bound),
@@ -58,13 +61,34 @@ shared_ptr<SearchEngine> IteratedSearch::create_current_phase() {
     return get_search_engine(phase);
 }
 
+void IteratedSearch::read_external_bound() {
+    ifstream file(bound_file);
+    int external_bound;
+    if (file >> external_bound && external_bound < best_bound) {
+        log << "Use external bound: " << external_bound << endl;
+        best_bound = external_bound;
+    }
+}
+
 SearchStatus IteratedSearch::step() {
     shared_ptr<SearchEngine> current_search = create_current_phase();
     if (!current_search) {
         return found_solution() ? SOLVED : FAILED;
     }
+    if (!bound_file.empty()) {
+        read_external_bound();
+    }
     if (pass_bound) {
         current_search->set_bound(best_bound);
+        if (best_bound != numeric_limits<int>::max() &&
+            current_search->reopens_closed_nodes()) {
+            /*
+              Exhausting the state space of this phase proves this bound.
+              Phases without reopening (e.g., greedy search) may prune a
+              state reached on an expensive path first, so they prove nothing.
+            */
+            log << "Cost bound of this phase: " << best_bound << endl;
+        }
     }
     ++phase;
 
@@ -172,6 +196,13 @@ static shared_ptr<SearchEngine> _parse(OptionParser &parser) {
     parser.add_option<bool>("continue_on_solve",
                             "continue search after solution found",
                             "true");
+    parser.add_option<string>(
+        "bound_file",
+        "before each phase, read an upper bound on the plan cost from this "
+        "file (if it exists) and use it like the cost of a plan found before. "
+        "This lets other planners running in parallel pass their solutions "
+        "on to this search.",
+        OptionParser::NONE);
     SearchEngine::add_options_to_parser(parser);
     Options opts = parser.parse();
 
@@ -24,6 +24,7 @@ class IteratedSearch : public SearchEngine {
     bool repeat_last_phase;
     bool continue_on_fail;
     bool continue_on_solve;
+    std::string bound_file;
 
     int phase;
     bool last_phase_found_solution;
@@ -33,6 +34,7 @@ class IteratedSearch : public SearchEngine {
     std::shared_ptr<SearchEngine> get_search_engine(int engine_configs_index);
     std::shared_ptr<SearchEngine> create_current_phase();
     SearchStatus step_return_value();
+    void read_external_bound();
 
     virtual SearchStatus step() override;
 
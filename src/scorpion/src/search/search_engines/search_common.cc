@@ -21,13 +21,28 @@ using SumEval = sum_evaluator::SumEvaluator;
 using WeightedEval = weighted_evaluator::WeightedEvaluator;
 
 shared_ptr<OpenListFactory> create_standard_scalar_open_list_factory(
-    const shared_ptr<Evaluator> &eval, bool pref_only) {
+    const shared_ptr<Evaluator> &eval, bool pref_only,
+    bool random_tiebreaking, int random_seed) {
     Options options;
     options.set("eval", eval);
     options.set("pref_only", pref_only);
+    options.set("random_tiebreaking", random_tiebreaking);
+    options.set("random_seed", random_seed);
     return make_shared<standard_scalar_open_list::BestFirstOpenListFactory>(options);
 }
 
+/*
+  Only the eager search plugins have the "random_tiebreaking" option.
+*/
+static bool use_random_tiebreaking(const Options &options) {
+    return options.contains("random_tiebreaking") &&
+           options.get<bool>("random_tiebreaking");
+}
+
+static int get_random_seed(const Options &options) {
+    return options.contains("random_seed") ? options.get<int>("random_seed") : -1;
+}
+
 static shared_ptr<OpenListFactory> create_alternation_open_list_factory(
     const vector<shared_ptr<OpenListFactory>> &subfactories, int boost) {
     Options options;
@@ -43,19 +58,20 @@ static shared_ptr<OpenListFactory> create_alternation_open_list_factory(
 static shared_ptr<OpenListFactory> create_alternation_open_list_factory_aux(
     const vector<shared_ptr<Evaluator>> &evals,
     const vector<shared_ptr<Evaluator>> &preferred_evaluators,
-    int boost) {
+    int boost, bool random_tiebreaking, int random_seed) {
     if (evals.size() == 1 && preferred_evaluators.empty()) {
-        return create_standard_scalar_open_list_factory(evals[0], false);
+        return create_standard_scalar_open_list_factory(
+            evals[0], false, random_tiebreaking, random_seed);
     } else {
         vector<shared_ptr<OpenListFactory>> subfactories;
         for (const shared_ptr<Evaluator> &evaluator : evals) {
             subfactories.push_back(
                 create_standard_scalar_open_list_factory(
-                    evaluator, false));
+                    evaluator, false, random_tiebreaking, random_seed));
             if (!preferred_evaluators.empty()) {
                 subfactories.push_back(
                     create_standard_scalar_open_list_factory(
-                        evaluator, true));
+                        evaluator, true, random_tiebreaking, random_seed));
             }
         }
         return create_alternation_open_list_factory(subfactories, boost);
@@ -67,7 +83,9 @@ shared_ptr<OpenListFactory> create_greedy_open_list_factory(
     return create_alternation_open_list_factory_aux(
         options.get_list<shared_ptr<Evaluator>>("evals"),
         options.get_list<shared_ptr<Evaluator>>("preferred"),
-        options.get<int>("boost"));
+        options.get<int>("boost"),
+        use_random_tiebreaking(options),
+        get_random_seed(options));
 }
 
 /*
@@ -123,7 +141,9 @@ shared_ptr<OpenListFactory> create_wastar_open_list_factory(
     return create_alternation_open_list_factory_aux(
         f_evals,
         options.get_list<shared_ptr<Evaluator>>("preferred"),
-        options.get<int>("boost"));
+        options.get<int>("boost"),
+        use_random_tiebreaking(options),
+        get_random_seed(options));
 }
 
 pair<shared_ptr<OpenListFactory>, const shared_ptr<Evaluator>>
@@ -145,6 +165,8 @@ create_astar_open_list_factory_and_f_eval(const Options &opts) {
     options.set("evals", evals);
     options.set("pref_only", false);
     options.set("unsafe_pruning", false);
+    options.set("random_tiebreaking", use_random_tiebreaking(opts));
+    options.set("random_seed", get_random_seed(opts));
     shared_ptr<OpenListFactory> open =
         make_shared<tiebreaking_open_list::TieBreakingOpenListFactory>(options);
     return make_pair(open, f);
@@ -29,17 +29,20 @@ class Options;
 
 namespace search_common {
 /*
-  Create a standard scalar open list factory with the given "eval" and
-  "pref_only" options.
+  Create a standard scalar open list factory with the given "eval",
+  "pref_only", "random_tiebreaking" and "random_seed" options.
 */
 extern std::shared_ptr<OpenListFactory> create_standard_scalar_open_list_factory(
-    const std::shared_ptr<Evaluator> &eval, bool pref_only);
+    const std::shared_ptr<Evaluator> &eval, bool pref_only,
+    bool random_tiebreaking = false, int random_seed = -1);
 
 /*
   Create open list factory for the eager_greedy or lazy_greedy plugins.
 
   Uses "evals", "preferred" and "boost" from the passed-in Options
   object to construct an open list factory of the appropriate type.
+  If the Options contain "random_tiebreaking", the open lists break ties
+  randomly with the "random_seed" of the Options.
 
   This is usually an alternation open list with:
   - one sublist for each evaluator, considering all successors
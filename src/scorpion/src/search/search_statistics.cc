@@ -4,10 +4,24 @@
 #include "utils/timer.h"
 #include "utils/system.h"
 
+#include <cstdio>
+#include <cstdlib>
 #include <iostream>
 
 using namespace std;
 
+static const double PROGRESS_REPORT_INTERVAL = 1.0;
+// Only look at the clock every this many steps.
+static const int PROGRESS_CHECK_STEPS = 1000;
+
+static FILE *get_progress_file() {
+    static FILE *progress_file = []() -> FILE * {
+            const char *filename = getenv("PLANNER_PROGRESS_FILE");
+            return filename ? fopen(filename, "a") : nullptr;
+        } ();
+    return progress_file;
+}
+
 
 SearchStatistics::SearchStatistics(utils::LogProxy &log)
     : log(log) {
@@ -25,12 +39,16 @@ SearchStatistics::SearchStatistics(utils::LogProxy &log)
     lastjump_generated_states = 0;
 
     lastjump_f_value = -1;
+
+    steps_since_progress_check = 0;
+    next_progress_time = 0;
 }
 
 void SearchStatistics::report_f_value_progress(int f) {
     if (f > lastjump_f_value) {
         lastjump_f_value = f;
         print_f_line();
+        report_progress();
         lastjump_expanded_states = expanded_states;
         lastjump_reopened_states = reopened_states;
         lastjump_evaluated_states = evaluated_states;
@@ -55,6 +73,34 @@ void SearchStatistics::print_checkpoint_line(int g) const {
     }
 }
 
+bool SearchStatistics::is_progress_report_due() {
+    if (!get_progress_file() || ++steps_since_progress_check < PROGRESS_CHECK_STEPS) {
+        return false;
+    }
+    steps_since_progress_check = 0;
+    return utils::g_timer() >= next_progress_time;
+}
+
+void SearchStatistics::report_progress(int num_registered_states) {
+    FILE *progress_file = get_progress_file();
+    if (!progress_file) {
+        return;
+    }
+    double time = utils::g_timer();
+    next_progress_time = time + PROGRESS_REPORT_INTERVAL;
+    fprintf(progress_file,
+            "{\"time\": %.3f, \"expanded\": %d, \"evaluated\": %d, \"generated\": %d",
+            time, expanded_states, evaluated_states, generated_states);
+    if (lastjump_f_value >= 0) {
+        fprintf(progress_file, ", \"f\": %d", lastjump_f_value);
+    }
+    if (num_registered_states >= 0) {
+        fprintf(progress_file, ", \"states\": %d", num_registered_states);
+    }
+    fprintf(progress_file, ", \"peak_memory_kb\": %d}\n", utils::get_peak_memory_in_kb());
+    fflush(progress_file);
+}
+
 void SearchStatistics::print_basic_statistics() const {
     log << evaluated_states << " evaluated, "
         << expanded_states << " expanded";
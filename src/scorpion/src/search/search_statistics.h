@@ -33,6 +33,10 @@ class SearchStatistics {
     int lastjump_evaluated_states;
     int lastjump_generated_states;
 
+    // Progress records for the driver (see report_progress).
+    int steps_since_progress_check;
+    double next_progress_time;
+
     void print_f_line() const;
 public:
     explicit SearchStatistics(utils::LogProxy &log);
@@ -74,6 +78,17 @@ public:
     void report_f_value_progress(int f);
     void print_checkpoint_line(int g) const;
 
+    /*
+      If the environment variable PLANNER_PROGRESS_FILE names a file,
+      append the current statistics to it as a line of JSON. Search
+      engines call is_progress_report_due() after every step and report
+      when it returns true, which happens at most every
+      PROGRESS_REPORT_INTERVAL seconds. Jumps in the f value are always
+      reported.
+    */
+    bool is_progress_report_due();
+    void report_progress(int num_registered_states = -1);
+
     // output
     void print_basic_statistics() const;
     void print_detailed_statistics() const;
@@ -16,11 +16,25 @@
 
 #include "../../task_utils/task_properties.h"
 #include "../../tasks/sdac_task.h"
+#include "../../utils/system.h"
+
+#include <cstdio>
+#include <cstdlib>
 
 using namespace std;
 using namespace options;
 
 namespace symbolic {
+static const double PROGRESS_REPORT_INTERVAL = 1.0;
+
+static FILE *get_progress_file() {
+    static FILE *progress_file = []() -> FILE * {
+            const char *filename = getenv("PLANNER_PROGRESS_FILE");
+            return filename ? fopen(filename, "a") : nullptr;
+        } ();
+    return progress_file;
+}
+
 SymbolicSearch::SymbolicSearch(const options::Options &opts)
     : SearchEngine(opts),
       task(opts.get<shared_ptr<AbstractTask>>("transform")),
@@ -36,7 +50,8 @@ SymbolicSearch::SymbolicSearch(const options::Options &opts)
       plan_data_base(opts.get<shared_ptr<PlanDataBase>>("plan_selection")),
       solution_registry(make_shared<SymSolutionRegistry>()),
       simple(opts.get<bool>("simple")),
-      silent(opts.get<bool>("silent")) {
+      silent(opts.get<bool>("silent")),
+      next_progress_time(0) {
     cout << endl;
     mgrParams.print_options();
     cout << endl;
@@ -114,6 +129,9 @@ SearchStatus SymbolicSearch::step() {
     }
 
     print_info(previous_num_plans);
+    if (get_progress_file() && (lower_bound_increased || utils::g_timer() >= next_progress_time)) {
+        report_progress();
+    }
     lower_bound_increased = false;
 
     if (cur_status == SOLVED) {
@@ -146,6 +164,21 @@ void SymbolicSearch::print_info(int previous_num_of_plans) {
     utils::g_log << ", total time: " << utils::g_timer << endl;
 }
 
+void SymbolicSearch::report_progress() {
+    FILE *progress_file = get_progress_file();
+    double time = utils::g_timer();
+    next_progress_time = time + PROGRESS_REPORT_INTERVAL;
+    fprintf(progress_file, "{\"time\": %.3f, \"step\": %d, \"lower_bound\": %d",
+            time, step_num, lower_bound);
+    if (upper_bound != numeric_limits<int>::max()) {
+        fprintf(progress_file, ", \"upper_bound\": %d", upper_bound);
+    }
+    fprintf(progress_file, ", \"min_g\": %d, \"plans\": %d, \"bdd_nodes\": %ld, \"peak_memory_kb\": %d}\n",
+            min_g, solution_registry->get_num_found_plans(), vars->numNodes(),
+            utils::get_peak_memory_in_kb());
+    fflush(progress_file);
+}
+
 void SymbolicSearch::setLowerBound(int lower) {
     if (lower < 0) {
         utils::g_log << "Overflow of lower cost bound to " << lower << "!" << endl;
@@ -54,12 +54,21 @@ protected:
 
     bool silent;
 
+    double next_progress_time;
+
     virtual void initialize() override;
 
     virtual SearchStatus step() override;
 
     virtual void print_info(int previous_num_of_plans);
 
+    /*
+      If the environment variable PLANNER_PROGRESS_FILE names a file, append
+      the bounds, the number of BDD nodes and the peak memory to it as a line
+      of JSON, so the driver can follow the search.
+    */
+    void report_progress();
+
 public:
     SymbolicSearch(const options::Options &opts);
     virtual ~SymbolicSearch() = default;
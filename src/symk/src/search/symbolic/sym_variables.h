@@ -185,6 +185,8 @@ public:
 
     inline void unsetTimeLimit() {manager->UnsetTimeLimit();}
 
+    inline long numNodes() const {return manager->ReadNodeCount();}
+
     void to_dot(const BDD &bdd, const std::string &file_name) const;
     void to_dot(const ADD &bdd, const std::string &file_name) const;
 